@@ -1,9 +1,15 @@
 from dotenv import load_dotenv
 load_dotenv()
+import uuid
+from collections import deque
+
 import streamlit as st
 from src.db import init_duckdb
-from src.rag import build_vectorstore, load_vectorstore
+from src.index_manager import IndexManager
 from src.agent import answer
+from src.entities import get_entity_index
+from src.embed_batcher import batched_embeddings
+from src.session_store import SessionStore
 
 # Choose embeddings (free local option)
 from langchain_huggingface import HuggingFaceEmbeddings
@@ -11,23 +17,36 @@ from langchain_huggingface import HuggingFaceEmbeddings
 st.set_page_config(page_title="Hybrid Financial Analyst Bot", layout="wide")
 st.title("Hybrid Financial Analyst Chatbot")
 
-if "state" not in st.session_state:
-    st.session_state.state = {}
+# Only the last few messages are kept for display; conversation memory for
+# the agent lives in the bounded server-side session store.
+MAX_DISPLAY_MESSAGES = 20
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = deque(maxlen=MAX_DISPLAY_MESSAGES)
 
 @st.cache_resource
 def get_con():
-    return init_duckdb("data/financial_data.csv")
+    con = init_duckdb("data/financial_data.csv")
+    get_entity_index(con)  # build the ticker/name/alias index from the table
+    return con
+
+@st.cache_resource
+def get_sessions():
+    # Shared by all browser sessions; idle sessions are evicted LRU-first
+    return SessionStore(max_sessions=10_000, budget_bytes=4096, idle_ttl_s=3600)
 
 @st.cache_resource
 def get_vectordb():
-    emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    # build once if store not present
-    import os
-    if not os.path.exists("chroma_store"):
-        return build_vectorstore("docs", emb, "chroma_store")
-    return load_vectorstore(emb, "chroma_store")
+    # Concurrent sessions' query embeddings share batched forward passes
+    emb = batched_embeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
+    # Versioned index: builds v1 if nothing exists, then rebuilds in the
+    # background and swaps atomically whenever docs/ changes.
+    manager = IndexManager(emb, root="chroma_store", pdf_dir="docs")
+    manager.load_or_build()
+    manager.start_watcher()
+    return manager
 
 con = get_con()
 vectordb = get_vectordb()
@@ -43,7 +62,8 @@ if user_q:
     with st.chat_message("user"):
         st.markdown(user_q)
 
-    result = answer(user_q, st.session_state.state, con, vectordb)
+    state = get_sessions().get(st.session_state.session_id)
+    result = answer(user_q, state, con, vectordb)
 
     with st.chat_message("assistant"):
         st.markdown(result["final"])
@@ -0,0 +1,157 @@
+"""
+Memory and latency of the compressed, memory-mapped chunk store.
+
+Part 1 (--chunks, default 1M synthetic chunks):
+  chunk store size vs raw text, RSS after opening it vs holding all text in
+  memory, top-k text fetch latency, and ChunkRecord vs dict metadata size.
+Part 2 (--index-chunks, default 20k): retrieve_semantic_company latency on a
+  LazyChunkIndex vs a Chroma store that keeps text next to the vectors.
+  Vector search itself is the same on both, so a hash embedding is used.
+
+    python bench_chunk_store.py --chunks 1000000 --index-chunks 20000
+"""
+import argparse
+import gc
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from src.chunk_store import ChunkRecord, ChunkStore, ChunkStoreWriter
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "TSLA", "META"]
+_WORDS = ("revenue growth margin cloud datacenter AI model inference customers risk regulatory supply "
+          "chain demand segment operating income fiscal quarter guidance investment capital expenditure "
+          "competition pricing platform services advertising devices subscription energy storage").split()
+
+
+def _rss_mb():
+    """(anonymous, file-backed) resident MB. File-backed mmap pages are clean and evictable."""
+    try:
+        vals = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    key, kb, _ = line.split()
+                    vals[key] = int(kb) / 1024
+        return vals["RssAnon:"], vals["RssFile:"]
+    except (OSError, KeyError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 0.0
+
+
+def synthetic_chunks(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    sentences = [" ".join(rng.choices(_WORDS, k=rng.randint(8, 18))).capitalize() + "." for _ in range(5000)]
+    for i in range(n):
+        yield f"[{i}] " + " ".join(rng.choices(sentences, k=7)), TICKERS[i % len(TICKERS)], i % 300
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 1)
+
+
+def bench_store(n: int, k: int):
+    tmp = tempfile.mkdtemp(prefix="chunk_store_bench_")
+    try:
+        raw = 0
+        t0 = time.perf_counter()
+        with ChunkStoreWriter(tmp) as w:
+            for text, _, _ in synthetic_chunks(n):
+                raw += len(text.encode("utf-8"))
+                w.append(text)
+        build = time.perf_counter() - t0
+        size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        print(f"chunks={n:,} raw text={raw / 2**20:.0f}MB store={size / 2**20:.0f}MB "
+              f"({raw / size:.1f}x) build={build:.1f}s")
+
+        gc.collect()
+        base_anon, base_file = _rss_mb()
+        store = ChunkStore(tmp)
+        rng = random.Random(1)
+        lat = []
+        for _ in range(10000):
+            ids = [rng.randrange(n) for _ in range(k)]
+            t = time.perf_counter()
+            store.get_many(ids)
+            lat.append((time.perf_counter() - t) * 1e6)
+        anon, file_ = _rss_mb()
+        print(f"chunk store: RSS anon +{anon - base_anon:.0f}MB, file-backed +{file_ - base_file:.0f}MB "
+              f"after 10k random top-{k} fetches; fetch p50={_pct(lat, 0.5)}us p99={_pct(lat, 0.99)}us")
+        store.close()
+
+        gc.collect()
+        base_anon, _ = _rss_mb()
+        in_memory = [(text, {"ticker": t, "source": f"docs/{t}.pdf", "page": p}) for text, t, p in synthetic_chunks(n)]
+        print(f"all text in memory: RSS anon +{_rss_mb()[0] - base_anon:.0f}MB")
+        del in_memory
+        gc.collect()
+
+        tracemalloc.start()
+        recs = [ChunkRecord(i, TICKERS[i % 7], f"docs/{TICKERS[i % 7]}.pdf", i % 300) for i in range(n)]
+        rec_mem = tracemalloc.get_traced_memory()[0]
+        del recs
+        tracemalloc.reset_peak()
+        dicts = [{"ticker": TICKERS[i % 7], "source": f"docs/{TICKERS[i % 7]}.pdf", "page": i % 300, "chunk_id": i}
+                 for i in range(n)]
+        dict_mem = tracemalloc.get_traced_memory()[0]
+        del dicts
+        tracemalloc.stop()
+        print(f"metadata for {n:,} chunks: ChunkRecord={rec_mem / 2**20:.0f}MB dict={dict_mem / 2**20:.0f}MB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_index(n: int, queries: int):
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.chunk_store import write_lazy_index
+    from src.rag import retrieve_semantic_company
+
+    emb = DeterministicFakeEmbedding(size=384)
+    docs = [
+        Document(page_content=text, metadata={"ticker": t, "source": f"docs/{t}.pdf", "page": p})
+        for text, t, p in synthetic_chunks(n, seed=9)
+    ]
+    tmp = tempfile.mkdtemp(prefix="chunk_index_bench_")
+    try:
+        legacy = Chroma(persist_directory=os.path.join(tmp, "legacy"), embedding_function=emb)
+        for i in range(0, n, 256):
+            legacy.add_documents(docs[i : i + 256])
+        lazy = write_lazy_index(docs, emb, os.path.join(tmp, "lazy"), batch_size=256)
+        del docs
+
+        qs = [f"What are the {w} risks for {t}?" for w, t in zip(_WORDS * 50, TICKERS * 200)][:queries]
+        for name, db in (("text in Chroma", legacy), ("lazy chunk store", lazy)):
+            lat = []
+            for q in qs:
+                t = time.perf_counter()
+                retrieve_semantic_company(db, q, k=4, global_k=20)
+                lat.append((time.perf_counter() - t) * 1000)
+            print(f"{name:>16}: retrieve_semantic_company p50={_pct(lat, 0.5)}ms "
+                  f"p99={_pct(lat, 0.99)}ms mean={statistics.mean(lat):.1f}ms (n={n:,})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=1_000_000)
+    ap.add_argument("--index-chunks", type=int, default=20_000)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--k", type=int, default=4)
+    args = ap.parse_args()
+
+    bench_store(args.chunks, args.k)
+    if args.index_chunks:
+        bench_index(args.index_chunks, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Digest hit rate and latency on a question log.
+
+Builds a throwaway index from docs/ (hash embeddings, so the run measures the
+answer path, not the model), builds digests for it with the stub LLM
+(stub_llm.py), then answers every logged question twice: with digests and
+through the normal route/retrieve/generate path.
+
+    python bench_digests.py --log questions.jsonl --llm-latency 0.8
+
+The log is one question per line, or JSONL with a "question" field. Lines are
+answered in order with one conversation state, so follow-ups resolve as they
+did for the user. Without --log a built-in sample is used. Narrow questions
+that must not be served by a digest (EXPECTED_MISSES) are always appended.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from stub_llm import start_stub_server
+
+SAMPLE_LOG = [
+    "What is the market cap of Tesla?",
+    "What are the risks for NVDA?",
+    "What AI initiatives did Microsoft mention?",
+    "What drove that growth?",
+    "Compare Apple's revenue and Microsoft's revenue.",
+    "What are the headwinds facing Apple's growth?",
+    "What is Meta's strategy?",
+    "What risks did NVIDIA mention?",
+    "Which company has the highest net income?",
+    "How is Meta investing in its infrastructure?",
+    "What are Alphabet's AI initiatives?",
+    "What challenges does Google face?",
+    "List the P/E ratios of all companies.",
+    "What are the key risk factors for Apple?",
+    "What are the growth drivers for Microsoft?",
+    "Why did NVIDIA's data center revenue grow in 2024?",
+    "What are the AI risks Microsoft mentions?",
+    "What is Apple's net income?",
+    "What is NVIDIA's strategy?",
+    "What headwinds does Meta mention?",
+]
+
+# One company + one topic keyword, but narrower than the generic digest: these
+# must go through retrieval. They are appended to every log and any digest hit
+# on them is reported as a false hit.
+EXPECTED_MISSES = [
+    "What are the cybersecurity risks for Microsoft?",
+    "Does Apple mention any legal challenges with the EU?",
+    "What is NVIDIA strategy in automotive?",
+    "Summarize the antitrust risks Google faces",
+    "What risks does Apple face in China?",
+    "What are Meta's AI initiatives in advertising?",
+]
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 1) if values else None
+
+
+def _read_log(path):
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("question", "")
+            if line:
+                out.append(line)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", default=None)
+    ap.add_argument("--port", type=int, default=8091)
+    ap.add_argument("--llm-latency", type=float, default=0.8)
+    args = ap.parse_args()
+
+    start_stub_server(args.port, rpm=0, latency=args.llm_latency)
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("LLM_RPM", "100000")
+    os.environ.setdefault("LLM_TPM", "100000000")
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.agent import _answer
+    from src.db import init_duckdb
+    from src.digests import get_digest_store, build_digests, write_digests
+    from src.rag import build_vectorstore
+
+    questions = (_read_log(args.log) if args.log else SAMPLE_LOG) + EXPECTED_MISSES
+    con = init_duckdb("data/financial_data.csv")
+    tmp = tempfile.mkdtemp(prefix="digest_bench_")
+    try:
+        vectordb = build_vectorstore("docs", DeterministicFakeEmbedding(size=384), tmp)
+        tickers = sorted({r.ticker for r in vectordb.iter_records()})
+        t0 = time.perf_counter()
+        data = build_digests(vectordb, tickers, workers=8)
+        write_digests(tmp, data)
+        print(f"digests: {len(tickers)} tickers, {data['chunks']} chunks, {data['map_calls']} map calls, "
+              f"built in {time.perf_counter() - t0:.1f}s")
+        store = get_digest_store(tmp)
+
+        rows = []  # (question, served_by_digest, ms_with, ms_without)
+        state_with, state_without = {}, {}
+        for q in questions:
+            t = time.perf_counter()
+            res = _answer(q, state_with, con, vectordb, store)
+            ms_with = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            _answer(q, state_without, con, vectordb, None)
+            ms_without = (time.perf_counter() - t) * 1000
+            rows.append((q, res["trace"]["source"] == "digest", ms_with, ms_without))
+
+        for q, hit, a, b in rows:
+            print(f"{'HIT ' if hit else 'miss'} {a:8.1f}ms {b:8.1f}ms  {q}")
+
+        hits = [r for r in rows if r[1]]
+        false_hits = [r[0] for r in hits if r[0] in EXPECTED_MISSES]
+        print(f"\nhit rate: {len(hits)}/{len(rows)} = {len(hits) / len(rows):.0%} "
+              f"(false hits on expected misses: {len(false_hits)}/{len(EXPECTED_MISSES)})")
+        for q in false_hits:
+            print(f"  FALSE HIT: {q}")
+        if hits:
+            print(f"digest hits:  p50={_pct([r[2] for r in hits], 0.5)}ms p99={_pct([r[2] for r in hits], 0.99)}ms  "
+                  f"same questions without digests: p50={_pct([r[3] for r in hits], 0.5)}ms "
+                  f"p99={_pct([r[3] for r in hits], 0.99)}ms")
+        print(f"whole log: mean {statistics.mean(r[2] for r in rows):.1f}ms with digests vs "
+              f"{statistics.mean(r[3] for r in rows):.1f}ms without")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Query-embedding throughput and latency under 1-64 concurrent clients:
+per-query embed_query (current path) vs the micro-batching EmbeddingBatcher.
+
+With --hf the real all-MiniLM-L6-v2 is used. Without it, a numpy transformer
+with MiniLM-L6's shape (6 layers, hidden 384, 12 heads, FFN 1536, random
+weights) stands in, so the run has the same per-call vs per-token cost
+structure without torch or a model download.
+
+    python bench_embed_batcher.py --clients 1 4 16 64 --seconds 5
+    python bench_embed_batcher.py --hf --max-batch 32 --max-wait-ms 2
+"""
+import argparse
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.embed_batcher import EmbeddingBatcher
+
+QUERIES = [
+    "What are the AI initiatives mentioned by Microsoft?",
+    "What are the headwinds facing Apple's growth?",
+    "What risks did NVIDIA mention?",
+    "How is Meta investing in its infrastructure?",
+    "What drove Alphabet's cloud revenue growth?",
+    "What is Microsoft's strategy for Azure?",
+    "Explain NVIDIA's data center demand commentary.",
+    "What supply chain risks does Apple disclose?",
+]
+
+
+class MiniLMShaped(Embeddings):
+    """Random-weight numpy encoder with all-MiniLM-L6-v2 dimensions (mean pooled, normalized)."""
+
+    def __init__(self, layers=6, hidden=384, heads=12, ffn=1536, vocab=30522, max_len=128, seed=0):
+        rng = np.random.default_rng(seed)
+        f = np.float32
+        self.heads, self.max_len, self.vocab = heads, max_len, vocab
+        self.tok = (rng.standard_normal((vocab, hidden)) * 0.02).astype(f)
+        self.pos = (rng.standard_normal((max_len, hidden)) * 0.02).astype(f)
+        self.layers = [
+            {
+                "qkv": (rng.standard_normal((hidden, 3 * hidden)) * 0.02).astype(f),
+                "o": (rng.standard_normal((hidden, hidden)) * 0.02).astype(f),
+                "f1": (rng.standard_normal((hidden, ffn)) * 0.02).astype(f),
+                "f2": (rng.standard_normal((ffn, hidden)) * 0.02).astype(f),
+            }
+            for _ in range(layers)
+        ]
+
+    def _ids(self, text):
+        words = re.findall(r"\w+|[^\w\s]", text.lower())[: self.max_len - 2]
+        return [101] + [zlib.crc32(w.encode()) % self.vocab for w in words] + [102]
+
+    @staticmethod
+    def _norm(x):
+        mu = x.mean(-1, keepdims=True)
+        return (x - mu) / np.sqrt(x.var(-1, keepdims=True) + 1e-12)
+
+    def embed_documents(self, texts):
+        ids = [self._ids(t) for t in texts]
+        n, length = len(ids), max(len(i) for i in ids)
+        mask = np.zeros((n, length), np.float32)
+        tok = np.zeros((n, length), np.int64)
+        for r, i in enumerate(ids):
+            tok[r, : len(i)] = i
+            mask[r, : len(i)] = 1
+        x = self.tok[tok] + self.pos[:length]
+        h, d = self.heads, x.shape[-1] // self.heads
+        bias = (1.0 - mask)[:, None, None, :] * -1e4
+        for w in self.layers:
+            q, k, v = np.split(x @ w["qkv"], 3, axis=-1)
+            q, k, v = (t.reshape(n, length, h, d).transpose(0, 2, 1, 3) for t in (q, k, v))
+            att = q @ k.transpose(0, 1, 3, 2) / np.sqrt(d) + bias
+            att = np.exp(att - att.max(-1, keepdims=True))
+            att /= att.sum(-1, keepdims=True)
+            ctx = (att @ v).transpose(0, 2, 1, 3).reshape(n, length, h * d)
+            x = self._norm(x + ctx @ w["o"])
+            x = self._norm(x + np.maximum(x @ w["f1"], 0) @ w["f2"])
+        pooled = (x * mask[..., None]).sum(1) / mask.sum(1, keepdims=True)
+        pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+def run(emb, clients: int, seconds: float):
+    lat = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def client(i):
+        n, mine = i, []
+        while time.perf_counter() < stop:
+            # Distinct texts so in-batch dedup does not flatter the batcher.
+            q = f"{QUERIES[n % len(QUERIES)]} #{i}-{n}"
+            n += 1
+            t = time.perf_counter()
+            emb.embed_query(q)
+            mine.append((time.perf_counter() - t) * 1000)
+        with lock:
+            lat.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return len(lat) / elapsed, _pct(lat, 0.5), _pct(lat, 0.99)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32, 64])
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--max-batch", type=int, default=32)
+    ap.add_argument("--max-wait-ms", type=float, default=2.0)
+    ap.add_argument("--hf", action="store_true")
+    args = ap.parse_args()
+
+    if args.hf:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        base = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    else:
+        base = MiniLMShaped()
+    base.embed_query("warmup")
+
+    print(f"{'clients':>7} | {'per-query qps':>13} {'p50':>7} {'p99':>7} | "
+          f"{'batched qps':>11} {'p50':>7} {'p99':>7} {'mean batch':>10}")
+    for c in args.clients:
+        qps, p50, p99 = run(base, c, args.seconds)
+        batcher = EmbeddingBatcher(base, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        bqps, bp50, bp99 = run(batcher, c, args.seconds)
+        mean_batch = batcher.metrics()["mean_batch"]
+        batcher.close()
+        print(f"{c:>7} | {qps:>13.0f} {p50:>6.1f}ms {p99:>6.1f}ms | "
+              f"{bqps:>11.0f} {bp50:>6.1f}ms {bp99:>6.1f}ms {mean_batch:>10}")
+
+
+if __name__ == "__main__":
+    main()
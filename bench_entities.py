@@ -0,0 +1,138 @@
+"""
+Benchmark entity resolution at scale.
+
+Compares the old approach (one regex per known ticker, per question) with the
+EntityIndex automaton on a synthetic universe of N companies.
+
+    python bench_entities.py --entities 10000 --questions 2000
+"""
+import argparse
+import random
+import re
+import statistics
+import string
+import time
+
+from src.entities import EntityIndex
+
+_SYLLABLES = ["al", "ba", "cor", "dex", "en", "fi", "gra", "hex", "io", "jun",
+              "ka", "lum", "mo", "nex", "or", "pa", "qua", "ro", "syn", "tek",
+              "ul", "vi", "wor", "xen", "yo", "zen"]
+_SUFFIXES = ["Inc.", "Corp", "Holdings", "Group", "Ltd", "Platforms"]
+_TEMPLATES = [
+    "What is the market cap of {}?",
+    "Compare the revenue of {} and {}.",
+    "What are the AI initiatives mentioned by {}?",
+    "What are the headwinds facing {}'s growth?",
+    "What drove that growth?",
+]
+
+
+# Real tickers that are English words; prose must not resolve to them.
+WORD_TICKERS = [
+    ("CASH", "Pathward Financial"), ("MOST", "MobileSmith Health"), ("NEXT", "NextDecade Corp"),
+    ("WELL", "Welltower Inc."), ("ALL", "Allstate Corp"), ("NOW", "ServiceNow Inc."),
+    ("IT", "Gartner Inc."), ("ON", "ON Semiconductor"), ("LOVE", "Lovesac Co"),
+    ("REAL", "RealReal Inc."), ("PLAY", "Dave & Buster's"), ("EARN", "Ellington Credit"),
+]
+_PROSE = [
+    "What is the cash position of {}?",
+    "What are the most important risks for {}?",
+    "What will {} do next year?",
+    "How well did {} do on margins?",
+    "Is it true that {} is growing now?",
+    "Would investors love to earn more from {}?",
+    "Is {}'s growth real?",
+]
+
+
+def make_universe(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    rows, aliases = list(WORD_TICKERS), []
+    seen_t, seen_n = {t for t, _ in rows}, {name.split()[0] for _, name in rows}
+    while len(rows) < n + len(WORD_TICKERS):
+        ticker = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 5)))
+        core = "".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))).capitalize()
+        if ticker in seen_t or core in seen_n:
+            continue
+        seen_t.add(ticker)
+        seen_n.add(core)
+        rows.append((ticker, f"{core} {rng.choice(_SUFFIXES)}"))
+        if rng.random() < 0.3:
+            aliases.append((core + "soft", ticker))
+    return rows, aliases
+
+
+def make_questions(rows, aliases, n: int, seed: int = 11):
+    rng = random.Random(seed)
+    names = [name.split()[0] for _, name in rows] + [a for a, _ in aliases]
+    tickers = [t for t, _ in rows]
+    out = []
+    for _ in range(n):
+        tpl = rng.choice(_TEMPLATES)
+        picks = [rng.choice(names + tickers) for _ in range(tpl.count("{}"))]
+        out.append(tpl.format(*picks))
+    return out
+
+
+def make_prose(rows, n: int, seed: int = 13):
+    """(question, expected tickers): lower-case word tickers next to one named company."""
+    rng = random.Random(seed)
+    named = rows[len(WORD_TICKERS):]
+    out = []
+    for _ in range(n):
+        ticker, name = rng.choice(named)
+        out.append((rng.choice(_PROSE).format(name.split()[0]), [ticker]))
+    return out
+
+
+def old_extract(question: str, tickers):
+    q = question.upper()
+    return [t for t in tickers if re.search(rf"\b{re.escape(t)}\b", q)]
+
+
+def timeit(fn, questions):
+    lat = []
+    for q in questions:
+        t0 = time.perf_counter()
+        fn(q)
+        lat.append((time.perf_counter() - t0) * 1e6)
+    lat.sort()
+    return {
+        "mean_us": round(statistics.mean(lat), 1),
+        "p50_us": round(lat[len(lat) // 2], 1),
+        "p99_us": round(lat[int(len(lat) * 0.99) - 1], 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entities", type=int, default=10000)
+    ap.add_argument("--questions", type=int, default=2000)
+    args = ap.parse_args()
+
+    rows, aliases = make_universe(args.entities)
+    questions = make_questions(rows, aliases, args.questions)
+    tickers = [t for t, _ in rows]
+
+    t0 = time.perf_counter()
+    idx = EntityIndex.from_rows(rows, aliases)
+    build_s = time.perf_counter() - t0
+    print(f"entities={len(idx)} aliases={len(aliases)} build={build_s:.2f}s")
+
+    # The regex scan is O(entities) per question; sample it to keep runtime sane.
+    sample = questions[: min(len(questions), 200)]
+    print("regex per ticker :", timeit(lambda q: old_extract(q, tickers), sample), f"(n={len(sample)})")
+    print("automaton exact  :", timeit(lambda q: idx.find_tickers(q, fuzzy=False), questions))
+    print("automaton+fuzzy  :", timeit(lambda q: idx.find_tickers(q, fuzzy=True), questions))
+
+    prose = make_prose(rows, min(args.questions, 500))
+    wrong = [(q, got) for q, want in prose if (got := idx.find_tickers(q)) != want]
+    print(f"lower-case prose with word tickers ({', '.join(t for t, _ in WORD_TICKERS)}): "
+          f"{len(prose) - len(wrong)}/{len(prose)} resolved to exactly the named company")
+    for q, got in wrong[:5]:
+        print(f"  {q!r} -> {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Query latency while the index is rebuilt in the background and swapped.
+
+Uses a deterministic hash embedding by default so the run measures the index
+swap, not the model; pass --hf to use all-MiniLM-L6-v2.
+
+    python bench_index_swap.py --clients 4
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from src.index_manager import IndexManager
+
+QUERIES = [
+    "What are the AI initiatives mentioned by Microsoft?",
+    "What are the headwinds facing Apple's growth?",
+    "What risks did NVIDIA mention?",
+    "How is Meta investing in its infrastructure?",
+]
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 1) if values else None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--baseline-s", type=float, default=3.0)
+    ap.add_argument("--hf", action="store_true")
+    args = ap.parse_args()
+
+    if args.hf:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    else:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        emb = DeterministicFakeEmbedding(size=384)
+
+    root = tempfile.mkdtemp(prefix="index_swap_bench_")
+    manager = IndexManager(emb, root=root, pdf_dir="docs")
+    try:
+        t0 = time.perf_counter()
+        manager.load_or_build()
+        print(f"initial build v{manager.version}: {time.perf_counter() - t0:.1f}s")
+
+        samples = []  # (phase, version, ms)
+        phase = ["before"]
+        stop = threading.Event()
+
+        def client(i):
+            n = i
+            while not stop.is_set():
+                q = QUERIES[n % len(QUERIES)]
+                n += 1
+                t = time.perf_counter()
+                with manager.acquire() as snap:
+                    snap.vectordb.similarity_search(q, k=4)
+                samples.append((phase[0], snap.version, (time.perf_counter() - t) * 1000))
+
+        threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(args.clients)]
+        for t in threads:
+            t.start()
+
+        time.sleep(args.baseline_s)
+        phase[0] = "during"
+        t0 = time.perf_counter()
+        manager.rebuild_async().join()
+        build_s = time.perf_counter() - t0
+        phase[0] = "after"
+        time.sleep(args.baseline_s)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        print(f"background rebuild -> v{manager.version}: {build_s:.1f}s")
+        for name in ("before", "during", "after"):
+            lat = [ms for p, _, ms in samples if p == name]
+            versions = sorted({v for p, v, _ in samples if p == name})
+            print(f"{name:>6}: n={len(lat):<6} p50={_pct(lat, 0.5)}ms p99={_pct(lat, 0.99)}ms "
+                  f"max={round(max(lat), 1) if lat else None}ms versions={versions}")
+    finally:
+        manager.stop_watcher()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Concurrent load test for the LLM scheduler against the local 429-enforcing stub.
+
+Runs the same workload twice:
+  direct    - every client calls the upstream API itself (old behaviour,
+              including the OpenAI SDK's default 2 retries on 429)
+  scheduled - calls go through LLMScheduler (single-flight + buckets + priority)
+
+Most prompts are distinct (--distinct), so the offered load stays above the
+rpm quota after coalescing: the token bucket has to hold requests back, and
+interactive calls should overtake queued batch calls (compare the two p95s
+and the per-priority queue waits).
+
+    python bench_llm_scheduler.py --clients 16 --requests 8 --rpm 60
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from stub_llm import start_stub_server
+
+QUESTIONS = [
+    "What is the market cap of Tesla?",
+    "Compare Apple's revenue and Microsoft's revenue.",
+    "What are the AI initiatives mentioned by Microsoft?",
+    "What are the headwinds facing Apple's growth?",
+    "Which company has the highest net income?",
+    "What risks did NVIDIA mention?",
+]
+
+
+def _pct(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 3)
+
+
+def run(mode, args, stub_state):
+    from src import llm
+    from src.llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, LLMScheduler
+
+    before_req, before_rej = stub_state.requests, stub_state.rejected
+    if mode == "scheduled":
+        os.environ["LLM_SCHEDULER"] = "1"
+        # Leave some headroom under the upstream quota.
+        llm._scheduler = LLMScheduler(workers=args.workers, max_queue=256, rpm=args.rpm * 0.9, tpm=0)
+    else:
+        os.environ["LLM_SCHEDULER"] = "0"
+
+    lat = {PRIORITY_INTERACTIVE: [], PRIORITY_BATCH: []}
+    errors = []
+    lock = threading.Lock()
+
+    def client(i):
+        rng = random.Random(i)
+        for n in range(args.requests):
+            prio = PRIORITY_BATCH if rng.random() < args.batch_share else PRIORITY_INTERACTIVE
+            q = rng.choice(QUESTIONS)
+            if rng.random() < args.distinct:
+                q = f"{q} (request {i}-{n})"
+            t0 = time.perf_counter()
+            try:
+                llm.chat_completion(
+                    [{"role": "user", "content": f"You are a routing function.\nQuestion: {q}"}],
+                    priority=prio,
+                )
+                with lock:
+                    lat[prio].append(time.perf_counter() - t0)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    total = args.clients * args.requests
+    print(f"\n=== {mode} ===")
+    print(f"requests={total} ok={total - len(errors)} errors={len(errors)} wall={wall:.1f}s")
+    print(f"upstream hits={stub_state.requests - before_req} upstream 429s={stub_state.rejected - before_rej}")
+    for prio, name in ((PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BATCH, "batch")):
+        print(f"{name:>11}: n={len(lat[prio])} p50={_pct(lat[prio], 0.5)}s p95={_pct(lat[prio], 0.95)}s")
+    if mode == "scheduled":
+        m = llm.get_scheduler().metrics()
+        print(f"throttled for {m['throttle_wait_s']}s in total, queue wait ms by priority "
+              f"(interactive={PRIORITY_INTERACTIVE}, batch={PRIORITY_BATCH}): {m['queue_wait_ms_avg']}")
+        print("scheduler:", m)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=8)
+    ap.add_argument("--rpm", type=int, default=60)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch-share", type=float, default=0.3)
+    ap.add_argument("--distinct", type=float, default=0.75, help="share of requests with a unique prompt")
+    args = ap.parse_args()
+
+    _, stub_state = start_stub_server(args.port, args.rpm, args.latency)
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+
+    run("direct", args, stub_state)
+    # Let the stub's one-minute window drain before the second run.
+    time.sleep(61)
+    run("scheduled", args, stub_state)
+
+
+if __name__ == "__main__":
+    main()
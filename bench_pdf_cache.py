@@ -0,0 +1,49 @@
+"""
+Re-chunk time from the extraction cache vs re-parsing every PDF.
+
+Embedding cost is identical on both paths, so only parse + split is timed.
+
+    python bench_pdf_cache.py
+"""
+import shutil
+import tempfile
+import time
+
+from src.pdf_cache import load_pdf_documents
+from src.rag import _ticker_to_name, split_documents
+
+SETTINGS = [(900, 150), (600, 100), (1200, 200), (400, 50)]
+
+
+def main():
+    names = _ticker_to_name()
+    cache_dir = tempfile.mkdtemp(prefix="pdf_cache_bench_")
+    try:
+        t0 = time.perf_counter()
+        pages = load_pdf_documents("docs", names, cache_dir)
+        cold = time.perf_counter() - t0
+        print(f"cold parse + cache write: {cold:.2f}s ({len(pages)} pages)")
+
+        for size, overlap in SETTINGS:
+            # Old path: every splitter change re-parsed every PDF.
+            full = cold + _time_split(pages, size, overlap)
+
+            t0 = time.perf_counter()
+            cached = load_pdf_documents("docs", names, cache_dir)
+            load = time.perf_counter() - t0
+            split = _time_split(cached, size, overlap)
+            print(f"chunk_size={size:<5} overlap={overlap:<4} "
+                  f"full rebuild={full:.2f}s  from cache={load + split:.3f}s "
+                  f"(load {load:.3f}s + split {split:.3f}s)  speedup={full / (load + split):.0f}x")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _time_split(pages, size, overlap):
+    t0 = time.perf_counter()
+    split_documents(pages, size, overlap)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    main()
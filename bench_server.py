@@ -0,0 +1,143 @@
+"""
+Load test for the HTTP answer service.
+
+By default it starts the stub LLM (stub_llm.py) and an in-process service with
+a warm DuckDB connection and numeric (SQL-route) questions, so no Groq quota or
+embedding model is needed. Point --url at a running `serve.py` to include RAG.
+
+    python bench_server.py --concurrency 32 --requests 400
+    python bench_server.py --url http://127.0.0.1:8000 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import aiohttp
+
+from stub_llm import start_stub_server
+
+SQL_QUESTIONS = [
+    "What is the market cap of Tesla?",
+    "Compare Apple's revenue and Microsoft's revenue.",
+    "Which company has the highest net income?",
+    "List the P/E ratios of all companies.",
+]
+RAG_QUESTIONS = [
+    "What are the AI initiatives mentioned by Microsoft?",
+    "What are the headwinds facing Apple's growth?",
+]
+
+
+def _pct(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 1)
+
+
+async def _one(session, url, question, session_id):
+    t0 = time.perf_counter()
+    ttfb = None
+    async with session.post(f"{url}/answer", json={"question": question, "session_id": session_id}) as resp:
+        if resp.status != 200:
+            await resp.read()
+            return resp.status, None, None
+        status = 200
+        async for line in resp.content:
+            if ttfb is None:
+                ttfb = (time.perf_counter() - t0) * 1000
+            event = json.loads(line)
+            if event.get("event") == "error":
+                status = event.get("status", 500)
+    return status, ttfb, (time.perf_counter() - t0) * 1000
+
+
+async def load(url, concurrency, total, questions):
+    results = []
+    counter = iter(range(total))
+
+    async def client(i):
+        rng = random.Random(i)
+        async with aiohttp.ClientSession() as session:
+            for _ in counter:
+                results.append(await _one(session, url, rng.choice(questions), f"bench-{i}"))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r[0] == 200]
+    lat = [r[2] for r in ok]
+    codes = {}
+    for r in results:
+        codes[r[0]] = codes.get(r[0], 0) + 1
+    print(f"concurrency={concurrency} requests={total} wall={wall:.1f}s rps={len(ok) / wall:.1f} status={codes}")
+    print(f"latency ms p50={_pct(lat, 0.5)} p95={_pct(lat, 0.95)} p99={_pct(lat, 0.99)}"
+          f" | ttfb p50={_pct([r[1] for r in ok], 0.5)}")
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/metrics") as resp:
+            m = await resp.json()
+    print("server:", {k: m[k] for k in ("completed", "rejected", "errors", "latency_ms")})
+    print("llm:", {k: m["llm"][k] for k in ("upstream_calls", "coalesced", "retries_429")})
+    print("sessions:", m["sessions"])
+    return m
+
+
+async def main_async(args):
+    if args.url:
+        await load(args.url.rstrip("/"), args.concurrency, args.requests, SQL_QUESTIONS + RAG_QUESTIONS)
+        return
+
+    start_stub_server(args.stub_port, rpm=0, latency=args.llm_latency)
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+    os.environ.setdefault("LLM_RPM", "0")
+    os.environ.setdefault("LLM_TPM", "0")
+    os.environ.setdefault("LLM_WORKERS", str(args.workers * 2))
+
+    from aiohttp import web
+    from src.db import init_duckdb
+    from src.entities import get_entity_index
+    from src.server import AnswerService, create_app
+    from src.session_store import SessionStore
+
+    con = init_duckdb("data/financial_data.csv")
+    get_entity_index(con)
+    # Fewer sessions than clients, so the configured limit is exercised and visible in /metrics.
+    sessions = SessionStore(max_sessions=args.max_sessions, budget_bytes=args.session_budget_bytes)
+    service = AnswerService(con, None, workers=args.workers, max_queue=args.max_queue, sessions=sessions)
+    runner = web.AppRunner(create_app(service))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    try:
+        m = await load(f"http://127.0.0.1:{args.port}", args.concurrency, args.requests, SQL_QUESTIONS)
+        s = m["sessions"]
+        assert (s["max_sessions"], s["budget_bytes"]) == (args.max_sessions, args.session_budget_bytes), s
+        # Sessions with a turn in flight are never evicted, so the store may run over by that many.
+        assert s["sessions"] <= args.max_sessions + args.concurrency, s
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=None, help="running serve.py instance; default starts one in-process")
+    ap.add_argument("--port", type=int, default=8010)
+    ap.add_argument("--stub-port", type=int, default=8091)
+    ap.add_argument("--llm-latency", type=float, default=0.2)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--max-queue", type=int, default=32)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--max-sessions", type=int, default=16)
+    ap.add_argument("--session-budget-bytes", type=int, default=2048)
+    args = ap.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
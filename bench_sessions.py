@@ -0,0 +1,120 @@
+"""
+Memory per 10k conversations and follow-up resolution latency: bounded
+Session records (src/session_store.py) vs the old per-session `state` dict
+plus full message history.
+
+    python bench_sessions.py --sessions 10000 --turns 30
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from src.memory import conversation_context, resolve_followup
+from src.session_store import SessionStore, TurnRecord, _tokens
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "META", "GOOGL", "AMZN", "TSLA"]
+QUESTIONS = [
+    "What is the market cap of {t}?",
+    "What are the AI initiatives mentioned by {t}?",
+    "Compare {t}'s revenue with its peers.",
+    "What risks did {t} mention?",
+]
+SQL = "SELECT company_name, ticker, market_cap_billions FROM financial_overview WHERE ticker = '{t}' LIMIT 200"
+ANSWER_CHARS = 1500  # a typical rendered RAG answer with bullets and evidence
+
+
+def _turn(rng, i):
+    t = rng.choice(TICKERS)
+    q = rng.choice(QUESTIONS).format(t=t)
+    result = {
+        "final": "x" * ANSWER_CHARS,
+        "trace": {
+            "source": "db" if i % 2 else "pdf",
+            "sql": SQL.format(t=t) if i % 2 else None,
+            "citations": [] if i % 2 else [{"chunk": c, "source": f"docs/{t}.pdf", "page": 10 + c} for c in range(1, 5)],
+        },
+    }
+    return q, t, result
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench_memory(n_sessions, turns, budget):
+    rng = random.Random(1)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    old = {}
+    for s in range(n_sessions):
+        state, messages = {}, []
+        for i in range(turns):
+            q, t, result = _turn(rng, i)
+            state["last_ticker"] = t
+            messages.append({"role": "user", "content": q})
+            messages.append({"role": "assistant", "content": result["final"]})
+        old[f"s{s}"] = (state, messages)
+    old_mem = tracemalloc.get_traced_memory()[0] - base
+    del old
+
+    rng = random.Random(1)
+    base = tracemalloc.get_traced_memory()[0]
+    store = SessionStore(max_sessions=n_sessions, budget_bytes=budget, idle_ttl_s=None)
+    for s in range(n_sessions):
+        session = store.get(f"s{s}")
+        for i in range(turns):
+            q, t, result = _turn(rng, i)
+            session.add_turn(TurnRecord.from_result(q, (t,), result))
+    new_mem = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print(f"{n_sessions:,} sessions x {turns} turns:")
+    print(f"  state dict + messages: {old_mem / 2**20:7.1f}MB ({old_mem / n_sessions / 1024:.1f}KB/session, grows per turn)")
+    print(f"  SessionStore:          {new_mem / 2**20:7.1f}MB ({new_mem / n_sessions / 1024:.1f}KB/session, "
+          f"budget {budget}B est, stats={store.stats()['est_bytes_total'] / 2**20:.1f}MB)")
+    return store
+
+
+def bench_followups(store, n, max_tokens):
+    rng = random.Random(2)
+    ids = [f"s{i}" for i in range(len(store))]
+    followups = ["What drove that growth?", "And the risks?", "How does that compare to last year?"]
+
+    lat_old, lat_new, ctx_tokens = [], [], []
+    old_state = {"last_ticker": "MSFT"}
+    for _ in range(n):
+        q = rng.choice(followups)
+        t = time.perf_counter()
+        resolve_followup(q, old_state)
+        lat_old.append((time.perf_counter() - t) * 1e6)
+
+        session = store.get(rng.choice(ids))
+        t = time.perf_counter()
+        q2 = resolve_followup(q, session)
+        ctx = conversation_context(q, session, max_tokens)
+        lat_new.append((time.perf_counter() - t) * 1e6)
+        ctx_tokens.append(_tokens(ctx))
+
+    print(f"follow-up resolution ({n:,} lookups):")
+    print(f"  old (ticker only):       p50={_pct(lat_old, 0.5):.1f}us p99={_pct(lat_old, 0.99):.1f}us")
+    print(f"  session + history:       p50={_pct(lat_new, 0.5):.1f}us p99={_pct(lat_new, 0.99):.1f}us "
+          f"(context tokens p50={_pct(ctx_tokens, 0.5)} max={max(ctx_tokens)}, budget {max_tokens})")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=10_000)
+    ap.add_argument("--turns", type=int, default=30)
+    ap.add_argument("--budget-bytes", type=int, default=4096)
+    ap.add_argument("--context-tokens", type=int, default=300)
+    ap.add_argument("--lookups", type=int, default=20_000)
+    args = ap.parse_args()
+
+    store = bench_memory(args.sessions, args.turns, args.budget_bytes)
+    bench_followups(store, args.lookups, args.context_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure how many broken LLM-generated SQL queries are repaired locally and the
+latency that saves versus the repair_sql LLM round trip.
+
+Each broken query goes through the agent's real path: generate_sql() (with the
+model's reply replaced by the broken SQL, so its is_safe_sql gate applies),
+then _run_sql_with_repair(). The repair round trips use the local stub LLM
+(stub_llm.py).
+
+    python bench_sql_repair.py --llm-latency 0.8
+"""
+import argparse
+import json
+import os
+import time
+
+from stub_llm import start_stub_server
+
+# (broken sql, what the model got wrong)
+CASES = [
+    ("SELECT company_name, markt_cap FROM financial_overview ORDER BY markt_cap DESC", "misspelled column"),
+    ("SELECT ticker, revenue FROM financial_overview ORDER BY revenue DESC", "short column name"),
+    ("SELECT net_income FROM financial_overview WHERE ticker = 'MSFT'", "short column name"),
+    ('SELECT market_cap_billions FROM financial_overview WHERE company_name = "Tesla Inc."', "double-quoted string"),
+    ("SELECT * FROM financial_overview WHERE ticker = 'AAPL", "unterminated string"),
+    ("```sql\nSELECT * FROM financial_overview WHERE ticker = ‘NVDA’\n```", "fences + smart quotes"),
+    ("SELECT ticker, pe FROM financial_data ORDER BY pe", "table + column"),
+    ("SELECT ticker AS created FROM financial_overview WHERE company_name = 'Update Corp'", "valid (old blacklist false positive)"),
+    ("SELECT sector, AVG(pe_ratio) FROM financial_overview GROUP BY sector", "valid, no LIMIT"),
+    ("SELEC ticker FROM financial_overview", "syntax error"),
+    ("SELECT ticker FROM financial_overview WHERE market_cap_billions > 'big'", "type error"),
+    ("SELECT growth_rate FROM financial_overview", "column that does not exist"),
+    ("SELECT ticker, income FROM financial_overview", "ambiguous column (must not become ticker)"),
+    ("SELECT ticker, revenue_2024_billions FROM financial_overview", "wrong year (must not become 2023)"),
+    ("SELECT ticker FROM financial_overview ORDER BY pe_ratio -- top", "trailing comment"),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--llm-latency", type=float, default=0.8)
+    args = ap.parse_args()
+
+    start_stub_server(args.port, rpm=0, latency=args.llm_latency)
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+
+    from src import db_sql_agent
+    from src.agent import _run_sql_with_repair
+    from src.db import init_duckdb
+    from src.sql_validate import repair_stats
+
+    real_chat = db_sql_agent.chat_completion
+    broken = {"sql": None}
+
+    def chat(messages, **kw):
+        # The generation call "returns" the broken SQL; repairs go to the stub.
+        if "SQL generator" in messages[0]["content"]:
+            return json.dumps({"sql": broken["sql"]})
+        return real_chat(messages, **kw)
+
+    db_sql_agent.chat_completion = chat
+    con = init_duckdb("data/financial_data.csv")
+    for sql, why in CASES:
+        broken["sql"] = sql
+        t0 = time.perf_counter()
+        try:
+            generated = db_sql_agent.generate_sql("benchmark question")
+            _, final_sql, extras = _run_sql_with_repair("benchmark question", generated, con)
+            outcome = extras.get("repair", "none")
+        except Exception as e:
+            final_sql, outcome = str(e)[:60], "failed"
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{outcome:>6} {ms:8.1f}ms  {why:<38} {final_sql[:70]!r}")
+
+    print("\n", repair_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Offline job: build per-company topic digests (risks, strategy, AI initiatives,
+growth drivers, headwinds) for the active index version.
+
+Map: every chunk of a ticker, in batches, is read once by the LLM and turned
+into cited points per topic. Reduce: points are merged into a few bullets per
+topic. The result is written to `<version dir>/digests.json`, so it is
+replaced together with the index; agent.answer serves matching questions
+from it without retrieval or generation. Each ticker's PDF hash is recorded,
+so an index rebuild keeps the digests of unchanged filings (see
+IndexManager); only changed tickers need `--tickers` again.
+
+    python build_digests.py                    # all tickers in docs/
+    python build_digests.py --tickers MSFT NVDA
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import os
+
+from src.digests import DIGEST_FILE, build_digests, merge_digests, pdf_tickers, write_digests
+from src.index_manager import INDEX_ROOT, read_pointer
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=INDEX_ROOT)
+    ap.add_argument("--pdf-dir", default="docs")
+    ap.add_argument("--tickers", nargs="*", help="default: one per PDF in --pdf-dir")
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from src.rag import load_vectorstore
+
+    path = read_pointer(args.root) or args.root
+    emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    vectordb = load_vectorstore(emb, path)
+
+    tickers = args.tickers or list(pdf_tickers(args.pdf_dir))
+    data = build_digests(vectordb, tickers, workers=args.workers, pdf_dir=args.pdf_dir)
+    if args.tickers:
+        merge_digests(path, data)  # keep the other tickers' digests
+    else:
+        write_digests(path, data)
+
+    filled = sum(bool(d["bullets"]) for topics in data["digests"].values() for d in topics.values())
+    print(f"{os.path.join(path, DIGEST_FILE)}: {len(data['digests'])} tickers, {filled} topic digests, "
+          f"{data['chunks']} chunks in {data['map_calls']} map calls, {data['build_s']}s")
+
+
+if __name__ == "__main__":
+    main()
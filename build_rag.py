@@ -2,19 +2,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from langchain_huggingface import HuggingFaceEmbeddings
-from src.rag import build_vectorstore
+from src.index_manager import IndexManager
+from src.pdf_cache import prune_cache
 
 emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-vectordb = build_vectorstore(
-    pdf_dir="docs",
-    embedding_fn=emb,
-    persist_dir="chroma_store"
-)
+# Builds a new chroma_store/v<N> and moves the CURRENT pointer to it.
+# A running app/service picks the new version up without a restart.
+manager = IndexManager(emb, root="chroma_store", pdf_dir="docs")
+snapshot = manager.rebuild()
+vectordb = snapshot.vectordb
+
+# Drop cached page text for PDFs that were removed or replaced
+prune_cache("docs")
 
 # Print chunk count so you know indexing worked
 try:
     count = vectordb._collection.count()
-    print("RAG index built:", count, "chunks")
+    print(f"RAG index v{snapshot.version} built:", count, "chunks")
 except Exception:
     print("RAG index built (count unavailable, but build succeeded).")
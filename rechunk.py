@@ -0,0 +1,50 @@
+"""
+Re-chunk the corpus with new splitter settings from the PDF extraction cache,
+without re-parsing any PDF.
+
+    python rechunk.py --chunk-size 600 --chunk-overlap 100             # stats only
+    python rechunk.py --chunk-size 600 --chunk-overlap 100 \\
+        --persist-dir chroma_store_600                                  # also embed
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import statistics
+import time
+
+from src.pdf_cache import CACHE_DIR, load_pdf_documents
+from src.rag import _ticker_to_name, split_documents
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf-dir", default="docs")
+    ap.add_argument("--cache-dir", default=CACHE_DIR)
+    ap.add_argument("--chunk-size", type=int, default=900)
+    ap.add_argument("--chunk-overlap", type=int, default=150)
+    ap.add_argument("--persist-dir", default=None, help="write a Chroma store with these chunks")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    pages = load_pdf_documents(args.pdf_dir, _ticker_to_name(), args.cache_dir)
+    t1 = time.perf_counter()
+    chunks = split_documents(pages, args.chunk_size, args.chunk_overlap)
+    t2 = time.perf_counter()
+
+    lengths = [len(c.page_content) for c in chunks]
+    print(f"pages={len(pages)} chunks={len(chunks)} "
+          f"mean_len={statistics.mean(lengths):.0f} max_len={max(lengths)}")
+    print(f"load_cache={t1 - t0:.2f}s split={t2 - t1:.2f}s")
+
+    if args.persist_dir:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from src.chunk_store import write_lazy_index
+
+        emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        write_lazy_index(chunks, emb, args.persist_dir)
+        print(f"embedded into {args.persist_dir} in {time.perf_counter() - t2:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+HTTP answer service (alternative entry point to the Streamlit app).
+
+    python serve.py --port 8000 --workers 4 --max-queue 32
+
+Endpoints:
+    POST /answer   {"question": "...", "session_id": "..."}  (NDJSON stream; ?stream=0 for JSON)
+    GET  /healthz
+    GET  /metrics
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+
+from aiohttp import web
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.db import init_duckdb
+from src.embed_batcher import EmbeddingBatcher
+from src.entities import get_entity_index
+from src.index_manager import IndexManager
+from src.server import AnswerService, create_app
+from src.session_store import SessionStore
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--max-queue", type=int, default=32)
+    ap.add_argument("--embed-max-batch", type=int, default=32)
+    ap.add_argument("--embed-max-wait-ms", type=float, default=2.0)
+    ap.add_argument("--max-sessions", type=int, default=10_000)
+    ap.add_argument("--session-budget-bytes", type=int, default=4096)
+    ap.add_argument("--session-idle-s", type=float, default=3600.0)
+    ap.add_argument("--refresh-digests", action="store_true",
+                    help="after an index rebuild, build digests for changed filings in the background")
+    args = ap.parse_args()
+
+    # Warm everything once; all requests share these.
+    con = init_duckdb("data/financial_data.csv")
+    get_entity_index(con)
+
+    # Query embeddings of concurrent requests are batched into one forward pass.
+    emb = EmbeddingBatcher(
+        HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"),
+        max_batch=args.embed_max_batch,
+        max_wait_ms=args.embed_max_wait_ms,
+    )
+    vectordb = IndexManager(emb, root="chroma_store", pdf_dir="docs", refresh_digests=args.refresh_digests)
+    vectordb.load_or_build()
+    vectordb.start_watcher()
+
+    sessions = SessionStore(
+        max_sessions=args.max_sessions,
+        budget_bytes=args.session_budget_bytes,
+        idle_ttl_s=args.session_idle_s,
+    )
+    service = AnswerService(con, vectordb, workers=args.workers, max_queue=args.max_queue, sessions=sessions)
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
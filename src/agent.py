@@ -1,9 +1,17 @@
+import time
+
 from src.router import route_query
 from src.db_sql_agent import generate_sql, repair_sql
 from src.db import run_sql
 from src.rag import retrieve
 from src.rag_answer import answer_from_docs
-from src.memory import extract_ticker, resolve_followup
+from src.memory import conversation_context, extract_ticker, resolve_followup
+from src.sql_validate import record_llm_repair, validate_sql
+from src.index_manager import IndexManager
+from src.chunk_store import LazyChunkIndex
+from src.digests import get_digest_store, render_digest
+from src.entities import get_entity_index
+from src.session_store import Session, TurnRecord
 
 
 def _should_force_rag(question: str) -> bool:
@@ -25,7 +33,63 @@ def _should_force_rag(question: str) -> bool:
     return has_qual and not has_num
 
 
-def answer(question, state, con, vectordb):
+def _run_sql_with_repair(question: str, sql: str, con):
+    """
+    Validate/fix the SQL locally first; only errors that survive the local
+    stage (or fail at execution) cost an LLM repair round trip.
+    Returns (df, final_sql, trace_extras).
+    """
+    extras = {}
+    try:
+        fixed, fixes = validate_sql(con, sql)
+        df = run_sql(con, fixed)
+        if fixes:
+            extras = {"repaired_from": sql, "repair": "local", "sql_fixes": fixes}
+        return df, fixed, extras
+    except Exception as e:
+        t0 = time.perf_counter()
+        sql2 = repair_sql(question, sql, str(e))
+        record_llm_repair((time.perf_counter() - t0) * 1000)
+
+    sql3, fixes = validate_sql(con, sql2)
+    df = run_sql(con, sql3)
+    extras = {"repaired_from": sql, "repair": "llm"}
+    if fixes:
+        extras["sql_fixes"] = fixes
+    return df, sql3, extras
+
+
+def _emit(on_event, event, **data):
+    if on_event is not None:
+        on_event({"event": event, **data})
+
+
+def answer(question, state, con, vectordb, on_event=None):
+    """
+    `vectordb` is a vector store or an IndexManager; with a manager the query
+    runs on the snapshot active when it started, reported as trace.index_version.
+    Questions about one company and one digest topic are answered from the
+    digests built for that index version (see build_digests.py).
+    `state` is a dict or a Session (src/session_store.py); a Session also
+    records the turn and feeds its bounded history to follow-ups.
+    `on_event`, if given, is called with progress events (route, sql, rows,
+    retrieved, digest) as each stage finishes; the HTTP service streams them.
+    """
+    if isinstance(vectordb, IndexManager):
+        with vectordb.acquire() as snap:
+            result = _answer(question, state, con, snap.vectordb, get_digest_store(snap.path), on_event)
+        result["trace"]["index_version"] = snap.version
+    else:
+        digests = get_digest_store(vectordb.persist_dir) if isinstance(vectordb, LazyChunkIndex) else None
+        result = _answer(question, state, con, vectordb, digests, on_event)
+
+    if isinstance(state, Session):
+        tickers = dict.fromkeys(get_entity_index().find_tickers(resolve_followup(question, state)))
+        state.add_turn(TurnRecord.from_result(question, tickers, result))
+    return result
+
+
+def _answer(question, state, con, vectordb, digests=None, on_event=None):
     q2 = resolve_followup(question, state)
 
     # update memory
@@ -33,7 +97,21 @@ def answer(question, state, con, vectordb):
     if t:
         state["last_ticker"] = t
 
-    route = route_query(q2)
+    hit = digests.lookup(q2) if digests is not None else None
+    if hit:
+        ticker, topic, digest = hit
+        _emit(on_event, "digest", ticker=ticker, topic=topic)
+        ans, cites = render_digest(ticker, digest)
+        return {
+            "final": ans,
+            "trace": {"source": "digest", "topic": topic, "ticker": ticker, "citations": cites,
+                      "route_reason": "precomputed digest"}
+        }
+
+    # LLM prompts also get the session's compact history; retrieval keeps q2.
+    q_llm = q2 + conversation_context(question, state)
+
+    route = route_query(q_llm)
     r = route.get("route", "RAG")
     if r not in ("SQL", "RAG"):
         r = "RAG"
@@ -42,37 +120,34 @@ def answer(question, state, con, vectordb):
     # ✅ ADD THIS BLOCK RIGHT HERE
     if r == "BOTH" and _should_force_rag(q2):
         r = "RAG"
+    _emit(on_event, "route", route=r, reason=route.get("reason"))
 
     if r == "SQL":
-        sql = generate_sql(q2)
-        try:
-            df = run_sql(con, sql)
-            return {
-                "final": df.to_markdown(index=False),
-                "trace": {"source": "db", "sql": sql, "route_reason": route.get("reason")}
-            }
-        except Exception as e:
-            sql2 = repair_sql(q2, sql, str(e))
-            df = run_sql(con, sql2)
-            return {
-                "final": df.to_markdown(index=False),
-                "trace": {"source": "db", "sql": sql2, "route_reason": route.get("reason"), "repaired_from": sql}
-            }
+        sql = generate_sql(q_llm)
+        df, final_sql, extras = _run_sql_with_repair(q_llm, sql, con)
+        _emit(on_event, "sql", sql=final_sql, rows=len(df))
+        return {
+            "final": df.to_markdown(index=False),
+            "trace": {"source": "db", "sql": final_sql, "route_reason": route.get("reason"), **extras}
+        }
 
     if r == "RAG":
         docs = retrieve(vectordb, q2, k=4)
-        ans, cites = answer_from_docs(q2, docs)
+        _emit(on_event, "retrieved", chunks=len(docs))
+        ans, cites = answer_from_docs(q_llm, docs)
         return {
             "final": ans,
             "trace": {"source": "pdf", "citations": cites, "route_reason": route.get("reason")}
         }
 
     # BOTH
-    sql = generate_sql(q2)
-    df = run_sql(con, sql)
+    sql = generate_sql(q_llm)
+    df, sql, extras = _run_sql_with_repair(q_llm, sql, con)
+    _emit(on_event, "sql", sql=sql, rows=len(df))
     docs = retrieve(vectordb, f"{q2}\nStructured result:\n{df.to_string(index=False)}", k=4)
-    ans, cites = answer_from_docs(q2, docs)
+    _emit(on_event, "retrieved", chunks=len(docs))
+    ans, cites = answer_from_docs(q_llm, docs)
     return {
         "final": f"**Database result:**\n{df.to_markdown(index=False)}\n\n**Document insight:**\n{ans}",
-        "trace": {"source": "both", "sql": sql, "citations": cites, "route_reason": route.get("reason")}
+        "trace": {"source": "both", "sql": sql, "citations": cites, "route_reason": route.get("reason"), **extras}
     }
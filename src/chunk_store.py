@@ -0,0 +1,234 @@
+# src/chunk_store.py
+from __future__ import annotations
+
+import mmap
+import os
+import zlib
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+DATA_FILE = "chunks.bin"
+INDEX_FILE = "chunks.idx"
+COLLECTION_NAME = "chunks"
+
+
+class ChunkRecord:
+    """
+    Search hit without text: chunk id plus the metadata retrieval filters on.
+    `text_id` is the chunk's blob in the ChunkStore, shared by chunks with
+    identical text (boilerplate repeated across filings or pages).
+    """
+
+    __slots__ = ("chunk_id", "ticker", "source", "page", "score", "text_id")
+
+    def __init__(
+        self,
+        chunk_id: int,
+        ticker: str,
+        source: str,
+        page: int,
+        score: float = 0.0,
+        text_id: Optional[int] = None,
+    ):
+        self.chunk_id = chunk_id
+        self.ticker = ticker
+        self.source = source
+        self.page = page
+        self.score = score
+        self.text_id = chunk_id if text_id is None else text_id
+
+    @property
+    def metadata(self) -> Dict[str, object]:
+        return {"ticker": self.ticker, "source": self.source, "page": self.page, "chunk_id": self.chunk_id}
+
+    def __repr__(self) -> str:
+        return f"ChunkRecord({self.chunk_id}, {self.ticker!r}, {self.source!r}, page={self.page})"
+
+
+class ChunkStoreWriter:
+    """
+    Append-only writer: each chunk's text is zlib-compressed into chunks.bin
+    and its end offset recorded in chunks.idx (uint64). Chunk ids are 0..n-1.
+    """
+
+    def __init__(self, directory: str, level: int = 6):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.level = level
+        self._data = open(os.path.join(directory, DATA_FILE), "wb")
+        self._offsets = array("Q", [0])
+
+    def append(self, text: str) -> int:
+        blob = zlib.compress(text.encode("utf-8"), self.level)
+        self._data.write(blob)
+        self._offsets.append(self._offsets[-1] + len(blob))
+        return len(self._offsets) - 2
+
+    def close(self):
+        self._data.close()
+        with open(os.path.join(self.directory, INDEX_FILE), "wb") as f:
+            self._offsets.tofile(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ChunkStore:
+    """Read side: both files are memory-mapped, so only touched pages stay resident."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._data_f = open(os.path.join(directory, DATA_FILE), "rb")
+        self._idx_f = open(os.path.join(directory, INDEX_FILE), "rb")
+        size = os.fstat(self._data_f.fileno()).st_size
+        self._data = mmap.mmap(self._data_f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._idx = mmap.mmap(self._idx_f.fileno(), 0, access=mmap.ACCESS_READ)
+        if isinstance(self._data, mmap.mmap) and hasattr(mmap, "MADV_RANDOM"):
+            # Lookups are random; kernel readahead would fault in neighbours we never read.
+            self._data.madvise(mmap.MADV_RANDOM)
+        self._offsets = memoryview(self._idx).cast("Q")
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, INDEX_FILE))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, chunk_id: int) -> str:
+        start, end = self._offsets[chunk_id], self._offsets[chunk_id + 1]
+        return zlib.decompress(self._data[start:end]).decode("utf-8")
+
+    def get_many(self, chunk_ids: Iterable[int]) -> List[str]:
+        return [self.get(i) for i in chunk_ids]
+
+    def close(self):
+        self._offsets.release()
+        self._idx.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data_f.close()
+        self._idx_f.close()
+
+
+class LazyChunkIndex:
+    """
+    Vector index that holds only ids + compact metadata (Chroma collection
+    without documents); chunk text lives in a ChunkStore and is fetched for
+    the final top-k only.
+    """
+
+    def __init__(self, persist_dir: str, embedding_fn, collection=None, client=None):
+        import chromadb
+
+        self.persist_dir = persist_dir
+        self.embedding_fn = embedding_fn
+        if collection is None:
+            client = chromadb.PersistentClient(path=persist_dir)
+            collection = client.get_or_create_collection(COLLECTION_NAME)
+        self._client = client
+        self._collection = collection
+        self.store: Optional[ChunkStore] = ChunkStore(persist_dir)
+
+    def search_records(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[ChunkRecord]:
+        emb = self.embedding_fn.embed_query(query)
+        res = self._collection.query(
+            query_embeddings=[emb],
+            n_results=k,
+            where=filter or None,
+            include=["metadatas", "distances"],
+        )
+        return [_record(cid, md, dist) for cid, md, dist in zip(res["ids"][0], res["metadatas"][0], res["distances"][0])]
+
+    def hydrate(self, records: Iterable[ChunkRecord]) -> List[Document]:
+        return [Document(page_content=self.store.get(r.text_id), metadata=r.metadata) for r in records]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        return self.hydrate(self.search_records(query, k=k, filter=filter))
+
+    def close(self):
+        """
+        Unmap the chunk files and release the Chroma client (its sqlite
+        handles), so the version directory can be deleted. Idempotent.
+        """
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self._client is not None and hasattr(self._client, "close"):  # chromadb >= 1.1
+            self._client.close()
+        self._client = None
+
+    def iter_records(self, where: Optional[dict] = None, batch: int = 1000) -> Iterator[ChunkRecord]:
+        """All records (optionally filtered), without text."""
+        offset = 0
+        while True:
+            res = self._collection.get(where=where or None, include=["metadatas"], limit=batch, offset=offset)
+            if not res["ids"]:
+                return
+            for cid, md in zip(res["ids"], res["metadatas"]):
+                yield _record(cid, md)
+            offset += len(res["ids"])
+
+
+def _record(cid, md: dict, score: float = 0.0) -> ChunkRecord:
+    # Stores written before text_id existed have one blob per record (text_id == id).
+    return ChunkRecord(
+        int(cid), md.get("ticker", ""), md.get("source", ""), int(md.get("page", 0)), score, md.get("text_id")
+    )
+
+
+def write_lazy_index(chunks: List[Document], embedding_fn, persist_dir: str, batch_size: int = 32) -> LazyChunkIndex:
+    """
+    Write chunk text to the chunk store and vectors + compact metadata to
+    Chroma. Text is compressed and embedded once per distinct text, but every
+    chunk keeps its own record (ticker/source/page, `text_id` -> shared blob),
+    so boilerplate repeated across filings stays in each company's results.
+    Only exact repeats (same text, source and page) are dropped.
+    """
+    import chromadb
+
+    records, seen = [], set()
+    text_ids: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+    with ChunkStoreWriter(persist_dir) as writer:
+        for c in chunks:
+            md = c.metadata
+            key = (c.page_content, md.get("source", ""), int(md.get("page", 0)))
+            if key in seen:
+                continue
+            seen.add(key)
+            if c.page_content not in text_ids:
+                text_ids[c.page_content] = writer.append(c.page_content)
+            counts[c.page_content] = counts.get(c.page_content, 0) + 1
+            records.append(c)
+
+    client = chromadb.PersistentClient(path=persist_dir)
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+    shared: Dict[str, List[float]] = {}  # vectors of texts used by several chunks
+    # Small batches keep GIL hold times short during background rebuilds.
+    for i in range(0, len(records), batch_size):
+        part = records[i : i + batch_size]
+        todo = list(dict.fromkeys(c.page_content for c in part if c.page_content not in shared))
+        vectors = dict(zip(todo, embedding_fn.embed_documents(todo))) if todo else {}
+        for text, vec in vectors.items():
+            if counts[text] > 1:
+                shared[text] = vec
+        collection.add(
+            ids=[str(cid) for cid in range(i, i + len(part))],
+            embeddings=[vectors.get(c.page_content) or shared[c.page_content] for c in part],
+            metadatas=[
+                {
+                    "ticker": c.metadata.get("ticker", ""),
+                    "source": c.metadata.get("source", ""),
+                    "page": int(c.metadata.get("page", 0)),
+                    "text_id": text_ids[c.page_content],
+                }
+                for c in part
+            ],
+        )
+    return LazyChunkIndex(persist_dir, embedding_fn, collection, client)
@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import json
+import re
 from typing import Any, Dict
 
 from src.llm import chat_completion
 from src.schemas import FIN_SCHEMA
 from src.db import TABLE_NAME
+from src.sql_validate import normalize_sql_text, strip_literals
 
 
 SQL_PROMPT = """
@@ -73,14 +75,21 @@ def _safe_json_extract(text: str) -> Dict[str, Any]:
 
 
 def is_safe_sql(sql: str) -> bool:
-    s = sql.strip().lower()
+    """
+    Cheap pre-check before DuckDB parsing (see src/sql_validate.py).
+    Runs on the normalized text (fences, smart quotes and comments removed),
+    so the local fixes in validate_sql() still get a chance. Keywords are
+    matched as whole words outside string literals, so an alias like
+    "created" or a name like 'Update Corp' is not rejected. Which tables may
+    be read is enforced by validate_sql(), which also fixes misspelled
+    table names.
+    """
+    s = strip_literals(normalize_sql_text(sql)).strip().lower()
 
-    if not s.startswith("select"):
-        return False
-    bad = ["insert", "update", "delete", "drop", "alter", "create", "attach", "copy"]
-    if any(k in s for k in bad):
+    if not (s.startswith("select") or s.startswith("with")):
         return False
-    if TABLE_NAME.lower() not in s:
+    bad = {"insert", "update", "delete", "drop", "alter", "create", "attach", "copy"}
+    if bad & set(re.findall(r"[a-z_]+", s)):
         return False
     return True
 
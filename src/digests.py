@@ -0,0 +1,414 @@
+# src/digests.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.entities import get_entity_index
+from src.llm_scheduler import PRIORITY_BATCH
+
+DIGEST_FILE = "digests.json"
+MAP_BATCH_CHARS = 6000
+MAX_BULLETS = 6
+REDUCE_GROUP = 40
+
+# Fixed topic taxonomy. `patterns` decide whether a question asks for the topic;
+# `words` are the only non-stopwords a question served by the digest may contain.
+TOPICS: Dict[str, Dict[str, object]] = {
+    "risks": {
+        "describe": "risk factors, uncertainties and threats the company discloses",
+        "patterns": [r"\brisks?\b", r"\brisk factors\b", r"\bthreats?\b"],
+        "words": {"risk", "risks", "factor", "factors", "threat", "threats", "uncertainties"},
+    },
+    "strategy": {
+        "describe": "business strategy, strategic priorities and long-term plans",
+        "patterns": [r"\bstrateg(?:y|ies|ic)\b", r"\bpriorities\b"],
+        "words": {"strategy", "strategies", "strategic", "priorities", "overall", "business"},
+    },
+    "ai_initiatives": {
+        "describe": "AI, machine learning and generative AI products, investments and initiatives",
+        "patterns": [r"\bai\b", r"\bartificial intelligence\b", r"\bgenerative\b", r"\bmachine learning\b"],
+        "words": {"ai", "artificial", "intelligence", "generative", "machine", "learning",
+                  "initiatives", "initiative", "plans", "efforts", "investments"},
+    },
+    "growth_drivers": {
+        "describe": "what drove revenue or business growth",
+        "patterns": [r"\bgrowth drivers?\b", r"\bdrivers? of growth\b", r"\b(?:drove|driving|drive)\b.*\bgrowth\b"],
+        "words": {"growth", "driver", "drivers", "drove", "driving", "drive", "grow"},
+    },
+    "headwinds": {
+        "describe": "headwinds, challenges and pressures on results",
+        "patterns": [r"\bheadwinds?\b", r"\bchallenges?\b", r"\bpressures?\b"],
+        "words": {"headwind", "headwinds", "challenge", "challenges", "pressure", "pressures",
+                  "growth", "results", "business"},
+    },
+}
+
+_TOPIC_RES = {t: [re.compile(p, re.IGNORECASE) for p in spec["patterns"]] for t, spec in TOPICS.items()}
+
+# Questions that need numbers, comparisons or a specific period go through the normal routes.
+_NOT_DIGEST_RE = re.compile(
+    r"\$|\b(?:compare|compared|vs\.?|versus|market cap|revenue|net income|eps|margin|profit|"
+    r"how much|top|highest|lowest|quarter|q[1-4]|fy\s?\d{2,4}|(?:19|20)\d\d)\b",
+    re.IGNORECASE,
+)
+
+# Words a generic "<company> <topic>" question may carry besides the company and topic.
+# Anything else ("cybersecurity", "EU", "automotive") narrows the question beyond the
+# digest, so it goes through retrieval instead.
+_QUESTION_WORDS = {
+    "what", "which", "how", "why", "are", "is", "was", "were", "the", "a", "an", "of", "for",
+    "to", "by", "in", "on", "at", "from", "and", "or", "s", "its", "their", "it", "they",
+    "that", "this", "those", "these", "do", "does", "did", "has", "have", "had", "any", "some",
+    "me", "tell", "about", "list", "give", "show", "describe", "explain", "summarize",
+    "summarise", "outline", "mention", "mentions", "mentioned", "discuss", "discusses",
+    "discussed", "disclose", "discloses", "disclosed", "cite", "cites", "cited", "highlight",
+    "highlights", "identify", "identifies", "key", "main", "major", "primary", "biggest",
+    "face", "faces", "facing", "see", "sees", "company",
+}
+
+# Context resolve_followup() appends to questions that name no company.
+_FOLLOWUP_CONTEXT_RE = re.compile(r"\s*\(Company ticker context:[^)]*\)\s*$")
+
+
+# ---------- question matching ----------
+
+def match_topic(question: str) -> Optional[str]:
+    """The single taxonomy topic a question asks about, or None (no topic, several, or numeric)."""
+    if _NOT_DIGEST_RE.search(question):
+        return None
+    hits = [t for t, res in _TOPIC_RES.items() if any(r.search(question) for r in res)]
+    return hits[0] if len(hits) == 1 else None
+
+
+def match_question(question: str) -> Optional[Tuple[str, str]]:
+    """
+    (ticker, topic) when the question is one company + one topic and nothing
+    else: after removing the company mention, the topic's words and question
+    stopwords no word may be left. Follow-ups take the company from the
+    context resolve_followup() appended.
+    """
+    topic = match_topic(question)
+    if topic is None:
+        return None
+    spans = get_entity_index().find_spans(question)
+    if len({t for _, _, t in spans}) != 1:
+        return None
+
+    m = _FOLLOWUP_CONTEXT_RE.search(question)
+    text = question[: m.start()] if m else question
+    for start, end, _ in reversed(spans):
+        if start < len(text):
+            text = text[:start] + " " + text[end:]
+    allowed = _QUESTION_WORDS | TOPICS[topic]["words"]
+    if any(w not in allowed for w in re.findall(r"[a-z0-9&]+", text.lower())):
+        return None
+    return spans[0][2], topic
+
+
+# ---------- store ----------
+
+class DigestStore:
+    """Digests of one index version, read from `<version dir>/digests.json`."""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.digests: Dict[str, Dict[str, dict]] = data.get("digests", {})
+
+    @classmethod
+    def load(cls, path: str) -> "DigestStore":
+        with open(os.path.join(path, DIGEST_FILE), encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def get(self, ticker: str, topic: str) -> Optional[dict]:
+        return self.digests.get(ticker, {}).get(topic)
+
+    def lookup(self, question: str) -> Optional[Tuple[str, str, dict]]:
+        """(ticker, topic, digest) if the question is served by a digest with content."""
+        m = match_question(question)
+        if m is None:
+            return None
+        digest = self.get(*m)
+        if not digest or not digest.get("bullets"):
+            return None
+        return m[0], m[1], digest
+
+
+_stores: Dict[str, Tuple[int, DigestStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_digest_store(path: Optional[str]) -> Optional[DigestStore]:
+    """
+    Cached DigestStore for an index version directory, or None if no digests
+    were built for it. Reloaded when build_digests.py rewrites the file.
+    """
+    if not path:
+        return None
+    try:
+        mtime = os.stat(os.path.join(path, DIGEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _stores_lock:
+        cached = _stores.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        store = DigestStore.load(path)
+    except (OSError, json.JSONDecodeError):
+        return None
+    with _stores_lock:
+        _stores[path] = (mtime, store)
+    return store
+
+
+def render_digest(ticker: str, digest: dict) -> Tuple[str, List[Dict]]:
+    """Answer text and citations in the same format as answer_from_docs()."""
+    chunks = digest.get("chunks", [])
+    citations = [{"chunk": i, "source": c["source"], "page": c["page"]} for i, c in enumerate(chunks, 1)]
+    source = chunks[0]["source"] if chunks else f"docs/{ticker}.pdf"
+
+    lines = [f"From {ticker} ({source}):"]
+    for b in digest.get("bullets", []):
+        cites = "".join(f"[{c}]" for c in b.get("cites", []))
+        lines.append(f"• {b.get('text', '').strip()} {cites} (evidence: \"{b.get('evidence', '')}\")")
+    return "\n".join(lines), citations
+
+
+# ---------- offline map-reduce ----------
+
+def _parse_json(raw: str) -> dict:
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start < 0 or end <= start:
+            return {}
+        try:
+            return json.loads(raw[start : end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+
+def _ticker_chunks(vectordb, ticker: str) -> List[Tuple[str, str, dict]]:
+    """All (key, text, metadata) chunks of one ticker, in page order."""
+    from src.chunk_store import LazyChunkIndex
+
+    if isinstance(vectordb, LazyChunkIndex):
+        records = sorted(vectordb.iter_records({"ticker": ticker}), key=lambda r: (r.page, r.chunk_id))
+        return [(str(r.chunk_id), vectordb.store.get(r.text_id), r.metadata) for r in records]
+
+    res = vectordb.get(where={"ticker": ticker}, include=["documents", "metadatas"])
+    rows = sorted(zip(res["ids"], res["documents"], res["metadatas"]), key=lambda x: x[2].get("page", 0))
+    return [(cid, text, md) for cid, text, md in rows]
+
+
+def _batches(chunks, max_chars: int):
+    batch, size = [], 0
+    for c in chunks:
+        if batch and size + len(c[1]) > max_chars:
+            yield batch
+            batch, size = [], 0
+        batch.append(c)
+        size += len(c[1])
+    if batch:
+        yield batch
+
+
+def _topic_list() -> str:
+    return "\n".join(f"- {t}: {spec['describe']}" for t, spec in TOPICS.items())
+
+
+def _map_batch(ticker: str, batch, chat: Callable) -> List[dict]:
+    """Map step: topic points from one batch of chunks, cited by chunk key."""
+    blocks = [f"[{i}] (page={md.get('page')})\n{text}" for i, (_, text, md) in enumerate(batch, 1)]
+    system = (
+        "You extract facts for a company digest (digest map step).\n"
+        "Return ONLY valid JSON. No markdown.\n"
+        "Use ONLY the provided chunks. Skip topics the chunks do not support.\n"
+        "Each point must cite chunk ids and include a short evidence quote (5–15 words).\n"
+    )
+    user = (
+        f"Company: {ticker}\n\nTopics:\n{_topic_list()}\n\n"
+        "Chunks:\n" + "\n\n".join(blocks) + "\n\n"
+        "Return JSON in this exact schema:\n"
+        '{"points": [{"topic": "risks", "text": "....", "cites": [1], "evidence": "quoted words"}]}\n'
+    )
+    data = _parse_json(chat([{"role": "system", "content": system}, {"role": "user", "content": user}]))
+
+    points = []
+    for p in data.get("points", []):
+        keys = [batch[c - 1][0] for c in p.get("cites", []) if isinstance(c, int) and 1 <= c <= len(batch)]
+        if p.get("topic") in TOPICS and keys and p.get("text"):
+            points.append({"topic": p["topic"], "text": p["text"], "keys": keys, "evidence": p.get("evidence", "")})
+    return points
+
+
+def _reduce_points(ticker: str, topic: str, points: List[dict], chat: Callable) -> List[dict]:
+    """Reduce step: merge points into at most MAX_BULLETS, keeping their chunk keys."""
+    if len(points) <= MAX_BULLETS:
+        return points
+    while len(points) > MAX_BULLETS:
+        merged = []
+        for i in range(0, len(points), REDUCE_GROUP):
+            group = points[i : i + REDUCE_GROUP]
+            listing = "\n".join(f"[{j}] {p['text']} (evidence: \"{p['evidence']}\")" for j, p in enumerate(group, 1))
+            system = (
+                "You merge extracted points into a short digest (digest reduce step).\n"
+                "Return ONLY valid JSON. No markdown.\n"
+                f"Combine duplicates, keep the most important, at most {MAX_BULLETS} bullets.\n"
+                "Each bullet must list the point ids it is based on and one evidence quote from them.\n"
+            )
+            user = (
+                f"Company: {ticker}\nTopic: {topic} ({TOPICS[topic]['describe']})\n\n"
+                f"Points:\n{listing}\n\n"
+                "Return JSON in this exact schema:\n"
+                '{"bullets": [{"text": "....", "points": [1, 3], "evidence": "quoted words"}]}\n'
+            )
+            data = _parse_json(chat([{"role": "system", "content": system}, {"role": "user", "content": user}]))
+            for b in data.get("bullets", [])[:MAX_BULLETS]:
+                refs = [group[j - 1] for j in b.get("points", []) if isinstance(j, int) and 1 <= j <= len(group)]
+                if refs and b.get("text"):
+                    keys = list(dict.fromkeys(k for p in refs for k in p["keys"]))
+                    merged.append({"topic": topic, "text": b["text"], "keys": keys,
+                                   "evidence": b.get("evidence") or refs[0]["evidence"]})
+        if not merged or len(merged) >= len(points):
+            return points[:MAX_BULLETS]  # the model did not reduce; keep the first points
+        points = merged
+    return points
+
+
+def _finalize(points: List[dict], meta: Dict[str, dict]) -> dict:
+    """Number the cited chunks 1..n (as answer_from_docs does) and point bullets at them."""
+    order: Dict[str, int] = {}
+    bullets = []
+    for p in points:
+        cites = [order.setdefault(k, len(order) + 1) for k in p["keys"]]
+        bullets.append({"text": p["text"], "cites": cites, "evidence": p["evidence"]})
+    chunks = [
+        {"chunk_id": k, "source": meta[k].get("source", "unknown"), "page": meta[k].get("page", "unknown")}
+        for k in order
+    ]
+    return {"bullets": bullets, "chunks": chunks}
+
+
+def pdf_tickers(pdf_dir: str) -> Dict[str, str]:
+    """Ticker -> PDF path, from the `<TICKER>.pdf` naming of the filings."""
+    return {
+        os.path.splitext(fn)[0].upper(): os.path.join(pdf_dir, fn)
+        for fn in sorted(os.listdir(pdf_dir))
+        if fn.lower().endswith(".pdf")
+    }
+
+
+def pdf_hashes(pdf_dir: str, tickers: Optional[List[str]] = None) -> Dict[str, str]:
+    """SHA-256 of each ticker's PDF; recorded with the digests to tell which are still current."""
+    from src.pdf_cache import file_sha256
+
+    paths = pdf_tickers(pdf_dir)
+    return {t: file_sha256(p) for t, p in paths.items() if tickers is None or t in tickers}
+
+
+def build_digests(
+    vectordb,
+    tickers: List[str],
+    chat: Optional[Callable] = None,
+    workers: int = 4,
+    max_chars: int = MAP_BATCH_CHARS,
+    pdf_dir: Optional[str] = None,
+) -> dict:
+    """
+    Map over every chunk of each ticker (batches of ~max_chars), then reduce
+    the points per topic. LLM calls go through the scheduler at batch
+    priority so a running app keeps precedence. With `pdf_dir`, the hash of
+    each ticker's PDF is stored under "sources" so a later index version can
+    reuse the digests of unchanged filings (carry_over_digests).
+    """
+    if chat is None:
+        from src.llm import chat_completion
+
+        def chat(messages):
+            return chat_completion(messages, temperature=0.0, priority=PRIORITY_BATCH)
+
+    t0 = time.perf_counter()
+    out: Dict[str, Dict[str, dict]] = {}
+    stats = {"chunks": 0, "map_calls": 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="digest") as pool:
+        for ticker in tickers:
+            chunks = _ticker_chunks(vectordb, ticker)
+            if not chunks:
+                continue
+            meta = {key: md for key, _, md in chunks}
+            batches = list(_batches(chunks, max_chars))
+            stats["chunks"] += len(chunks)
+            stats["map_calls"] += len(batches)
+
+            by_topic: Dict[str, List[dict]] = {t: [] for t in TOPICS}
+            for points in pool.map(lambda b: _map_batch(ticker, b, chat), batches):
+                for p in points:
+                    by_topic[p["topic"]].append(p)
+
+            reduced = pool.map(lambda t: (t, _reduce_points(ticker, t, by_topic[t], chat)), list(TOPICS))
+            out[ticker] = {t: _finalize(points, meta) for t, points in reduced}
+
+    return {
+        "built_at": time.time(),
+        "build_s": round(time.perf_counter() - t0, 1),
+        "topics": list(TOPICS),
+        **stats,
+        "sources": pdf_hashes(pdf_dir, list(out)) if pdf_dir else {},
+        "digests": out,
+    }
+
+
+def write_digests(path: str, data: dict):
+    """Store digests inside an index version directory (atomic replace)."""
+    tmp = os.path.join(path, f".{DIGEST_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, os.path.join(path, DIGEST_FILE))
+
+
+def merge_digests(path: str, data: dict):
+    """Add freshly built tickers to the digests already stored for a version."""
+    try:
+        with open(os.path.join(path, DIGEST_FILE), encoding="utf-8") as f:
+            old = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        old = {}
+    merged = {**old, **{k: v for k, v in data.items() if k not in ("digests", "sources")}}
+    merged["sources"] = {**old.get("sources", {}), **data.get("sources", {})}
+    merged["digests"] = {**old.get("digests", {}), **data.get("digests", {})}
+    write_digests(path, merged)
+
+
+def carry_over_digests(old_path: Optional[str], new_path: str, pdf_dir: str) -> Dict[str, List[str]]:
+    """
+    Copy the digests of tickers whose PDF is byte-identical to the one they
+    were built from into a new index version. Digests cite by source and
+    page, which an unchanged PDF keeps across rebuilds. Tickers whose PDF
+    changed, or that were built without a recorded hash, are dropped.
+    """
+    try:
+        with open(os.path.join(old_path or "", DIGEST_FILE), encoding="utf-8") as f:
+            old = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"carried": [], "dropped": []}
+
+    recorded = old.get("sources", {})
+    current = pdf_hashes(pdf_dir, list(old.get("digests", {})))
+    carried = sorted(t for t in old.get("digests", {}) if t in current and recorded.get(t) == current[t])
+    dropped = sorted(t for t in old.get("digests", {}) if t not in carried)
+    if carried:
+        write_digests(new_path, {
+            **old,
+            "carried_from": os.path.basename(old_path),
+            "sources": {t: recorded[t] for t in carried},
+            "digests": {t: old["digests"][t] for t in carried},
+        })
+    return {"carried": carried, "dropped": dropped}
@@ -0,0 +1,148 @@
+# src/embed_batcher.py
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+_STOP = object()
+
+
+class EmbeddingBatcher(Embeddings):
+    """
+    Micro-batching wrapper around an embedding model.
+
+    Concurrent `embed_query` calls (one per retrieval) are queued; a dedicated
+    thread takes the first waiting query, collects more for up to
+    `max_wait_ms` or until `max_batch`, and embeds them with one
+    `embed_documents` forward pass. Identical texts in a batch are embedded
+    once. Queries that arrive while a batch runs form the next batch, so
+    under load batches fill without waiting.
+
+    Batching queries through `embed_documents` assumes a symmetric model
+    (no query-specific prompt), which holds for all-MiniLM-L6-v2.
+    `embed_documents` itself (index builds) is already batched and goes
+    straight to the model.
+    """
+
+    def __init__(self, base: Embeddings, max_batch: int = 32, max_wait_ms: float = 2.0):
+        self.base = base
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats = {"queries": 0, "batches": 0, "deduped": 0, "max_batch_seen": 0, "model_ms_total": 0.0}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    # ---------- Embeddings interface ----------
+
+    def embed_query(self, text: str) -> List[float]:
+        if self._closed or threading.current_thread() is self._thread:
+            return self.base.embed_query(text)
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    # ---------- batching thread ----------
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # Take whatever is already queued, then wait up to the deadline for more.
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                self._queue.put(_STOP)  # handled after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+
+            unique: Dict[str, int] = {}
+            for text, _ in batch:
+                unique.setdefault(text, len(unique))
+            t0 = time.perf_counter()
+            try:
+                vectors = self.base.embed_documents(list(unique))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            model_ms = (time.perf_counter() - t0) * 1000
+
+            for text, fut in batch:
+                fut.set_result(vectors[unique[text]])
+            with self._stats_lock:
+                s = self._stats
+                s["queries"] += len(batch)
+                s["batches"] += 1
+                s["deduped"] += len(batch) - len(unique)
+                s["max_batch_seen"] = max(s["max_batch_seen"], len(batch))
+                s["model_ms_total"] += model_ms
+
+    # ---------- lifecycle / stats ----------
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches = s["batches"]
+        return {
+            "queries": s["queries"],
+            "batches": batches,
+            "mean_batch": round(s["queries"] / batches, 2) if batches else None,
+            "max_batch_seen": s["max_batch_seen"],
+            "deduped": s["deduped"],
+            "model_ms_avg": round(s["model_ms_total"] / batches, 2) if batches else None,
+            "queued": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def close(self):
+        """Stop the batching thread; later queries are embedded directly."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+
+
+def batched_embeddings(base: Embeddings) -> Embeddings:
+    """
+    Wrap `base` in an EmbeddingBatcher configured from the environment.
+
+    Optional:
+      - EMBED_MAX_BATCH (default 32), EMBED_MAX_WAIT_MS (default 2)
+      - EMBED_BATCHING=0 returns `base` unchanged (per-query embedding)
+    """
+    if os.environ.get("EMBED_BATCHING", "1") == "0":
+        return base
+    return EmbeddingBatcher(
+        base,
+        max_batch=int(os.environ.get("EMBED_MAX_BATCH", "32")),
+        max_wait_ms=float(os.environ.get("EMBED_MAX_WAIT_MS", "2")),
+    )
@@ -0,0 +1,324 @@
+# src/entities.py
+from __future__ import annotations
+
+import csv
+import difflib
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.db import TABLE_NAME
+
+DEFAULT_CSV_PATH = "data/financial_data.csv"
+DEFAULT_ALIAS_PATH = "data/entity_aliases.csv"
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9&]+")
+
+# Trailing words dropped from company names so "Apple Inc." is also found as "Apple".
+_NAME_SUFFIXES = {
+    "inc", "corp", "corporation", "co", "company", "com", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "ag", "nv", "holdings", "group", "platforms",
+}
+
+# Question words that must never be fuzzy-matched to a company name.
+_STOPWORDS = {
+    "what", "which", "where", "when", "about", "compare", "company", "companies",
+    "revenue", "income", "market", "margin", "profit", "growth", "their", "there",
+    "these", "those", "mentioned", "initiatives", "strategy", "risks", "drivers",
+    "headwinds", "explain", "between", "highest", "lowest", "billions",
+}
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def _normalize(text: str) -> Tuple[str, ...]:
+    return tuple(t.lower() for t in _tokenize(text))
+
+
+def _core_name(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    core = list(tokens)
+    while len(core) > 1 and core[-1] in _NAME_SUFFIXES:
+        core.pop()
+    return tuple(core)
+
+
+class EntityIndex:
+    """
+    Resolves tickers, company names and aliases in free text.
+
+    All phrases are compiled into one word-level Aho-Corasick automaton, so a
+    question is scanned once regardless of how many entities are indexed.
+    Misspellings such as "Microsft" or "Nvidea" are caught by a fuzzy pass
+    (difflib) that is off by default in find_tickers(), since ordinary words
+    ("apply", "metal") would otherwise turn into tickers; resolve_name()
+    uses it for strings that are known to be company names.
+    """
+
+    def __init__(self):
+        # (state, token) -> next state; state 0 is the root
+        self._goto: Dict[Tuple[int, str], int] = {}
+        self._fail: List[int] = [0]
+        # state -> (phrase_len, ticker, strict) for phrases ending exactly there;
+        # _out additionally merges the outputs reachable through failure links.
+        self._own: List[List[Tuple[int, str, bool]]] = [[]]
+        self._out: List[List[Tuple[int, str, bool]]] = [[]]
+        self._phrases: Dict[Tuple[str, ...], str] = {}
+        self._added: set[Tuple[Tuple[str, ...], bool]] = set()
+        self._fuzzy_keys: Dict[str, Dict[str, str]] = {}
+        self._tickers: set[str] = set()
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._tickers
+
+    @property
+    def tickers(self) -> set[str]:
+        return set(self._tickers)
+
+    # ---------- building ----------
+
+    def _add_phrase(self, tokens: Tuple[str, ...], ticker: str, strict: bool = False):
+        if not tokens or (tokens, strict) in self._added or (tokens, False) in self._added:
+            return
+        # A strict ticker and a caseless name may share tokens ("META" / "Meta"); keep both.
+        self._added.add((tokens, strict))
+        self._phrases.setdefault(tokens, ticker)
+
+        state = 0
+        for tok in tokens:
+            nxt = self._goto.get((state, tok))
+            if nxt is None:
+                nxt = len(self._fail)
+                self._goto[(state, tok)] = nxt
+                self._fail.append(0)
+                self._own.append([])
+            state = nxt
+        self._own[state].append((len(tokens), ticker, strict))
+
+        if not strict:
+            key = " ".join(tokens)
+            if len(key) >= 4:
+                self._fuzzy_keys.setdefault(key[0], {})[key] = ticker
+        self._built = False
+
+    def add_ticker(self, ticker: str):
+        ticker = ticker.strip().upper()
+        if not ticker:
+            return
+        self._tickers.add(ticker)
+        # Bare tickers must appear in upper case at any length: "IT", "NOW", "CASH",
+        # "MOST" are words. Lower-case mentions are covered by names and aliases.
+        self._add_phrase(_normalize(ticker), ticker, strict=True)
+
+    def add_name(self, name: str, ticker: str):
+        ticker = ticker.strip().upper()
+        tokens = _normalize(name)
+        if not tokens:
+            return
+        self._tickers.add(ticker)
+        self._add_phrase(tokens, ticker)
+        core = _core_name(tokens)
+        if core != tokens and len(" ".join(core)) >= 3:
+            self._add_phrase(core, ticker)
+
+    def add_alias(self, alias: str, ticker: str):
+        ticker = ticker.strip().upper()
+        tokens = _normalize(alias)
+        if not tokens:
+            return
+        self._tickers.add(ticker)
+        # Aliases written in upper case ("AWS", "FB", "GOOG") behave like tickers.
+        self._add_phrase(tokens, ticker, strict=alias.strip().isupper())
+
+    def build(self) -> "EntityIndex":
+        """Compute failure links (BFS over the trie)."""
+        children: Dict[int, List[Tuple[str, int]]] = {}
+        for (state, tok), nxt in self._goto.items():
+            children.setdefault(state, []).append((tok, nxt))
+
+        self._out = [list(o) for o in self._own]
+        queue = deque()
+        for _, nxt in children.get(0, []):
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in children.get(state, []):
+                f = self._fail[state]
+                while f and (f, tok) not in self._goto:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto.get((f, tok), 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+        self._built = True
+        return self
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Tuple[str, str]],
+        aliases: Iterable[Tuple[str, str]] = (),
+    ) -> "EntityIndex":
+        """rows = (ticker, company_name); aliases = (alias, ticker)."""
+        idx = cls()
+        for ticker, name in rows:
+            if not ticker:
+                continue
+            idx.add_ticker(str(ticker))
+            if name:
+                idx.add_name(str(name), str(ticker))
+        for alias, ticker in aliases:
+            if alias and ticker:
+                idx.add_alias(str(alias), str(ticker))
+        return idx.build()
+
+    @classmethod
+    def from_csv(cls, csv_path: str = DEFAULT_CSV_PATH, alias_path: str = DEFAULT_ALIAS_PATH) -> "EntityIndex":
+        rows = []
+        if os.path.exists(csv_path):
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                rows = [(r.get("ticker", ""), r.get("company_name", "")) for r in csv.DictReader(f)]
+        return cls.from_rows(rows, load_aliases(alias_path))
+
+    @classmethod
+    def from_duckdb(cls, con, alias_path: str = DEFAULT_ALIAS_PATH) -> "EntityIndex":
+        rows = con.execute(f"SELECT ticker, company_name FROM {TABLE_NAME}").fetchall()
+        return cls.from_rows(rows, load_aliases(alias_path))
+
+    # ---------- lookup ----------
+
+    def _scan(self, text: str) -> List[Tuple[int, int, str]]:
+        """Return (start, end, ticker) spans for every exact phrase hit."""
+        if not self._built:
+            self.build()
+
+        raw = _tokenize(text)
+        hits = []
+        state = 0
+        for i, tok in enumerate(raw):
+            low = tok.lower()
+            while state and (state, low) not in self._goto:
+                state = self._fail[state]
+            state = self._goto.get((state, low), 0)
+            for length, ticker, strict in self._out[state]:
+                start = i - length + 1
+                if strict and not all(t.isupper() or t.isdigit() for t in raw[start : i + 1]):
+                    continue
+                hits.append((start, i + 1, ticker))
+        return hits
+
+    def _fuzzy(self, text: str, cutoff: float, proper_nouns: bool = True) -> List[str]:
+        """
+        With proper_nouns, only capitalized words of 5+ letters are candidates
+        (free text); without, every non-stopword of 4+ letters (a name field).
+        """
+        raw = _tokenize(text)
+        tokens = tuple(t.lower() for t in raw)
+        min_len = 5 if proper_nouns else 4
+        grams = []
+        for n in (2, 1):
+            for i in range(len(tokens) - n + 1):
+                gram = tokens[i : i + n]
+                if proper_nouns and not raw[i][0].isupper():
+                    continue
+                if n == 1 and (len(gram[0]) < min_len or gram[0] in _STOPWORDS):
+                    continue
+                grams.append((i, " ".join(gram)))
+
+        found = []
+        for _, gram in sorted(grams):
+            bucket = self._fuzzy_keys.get(gram[0])
+            if not bucket:
+                continue
+            match = difflib.get_close_matches(gram, bucket.keys(), n=1, cutoff=cutoff)
+            if match and bucket[match[0]] not in found:
+                found.append(bucket[match[0]])
+        return found
+
+    def find_spans(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Non-overlapping (start, end, ticker) character spans of exact entity
+        mentions, left to right.
+        """
+        hits = self._scan(text)
+        # Longest match wins when spans overlap ("Amazon Web Services" over "Amazon").
+        hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+        words = list(_TOKEN_RE.finditer(text))
+        spans = []
+        covered_until = 0
+        for start, end, ticker in hits:
+            if start < covered_until:
+                continue
+            covered_until = end
+            spans.append((words[start].start(), words[end - 1].end(), ticker))
+        return spans
+
+    def find_tickers(self, text: str, fuzzy: bool = False, cutoff: float = 0.85) -> List[str]:
+        """
+        Tickers mentioned in `text`, in order of first appearance. With
+        fuzzy=True, capitalized words that nearly match a name count too.
+        """
+        out: List[str] = []
+        for _, _, ticker in self.find_spans(text):
+            if ticker not in out:
+                out.append(ticker)
+
+        if not out and fuzzy:
+            out = self._fuzzy(text, cutoff)
+        return out
+
+    def resolve_name(self, name: str) -> Optional[str]:
+        """Resolve a company name, alias or ticker to a single ticker."""
+        tokens = _normalize(name)
+        if not tokens:
+            return None
+        exact = self._phrases.get(tokens) or self._phrases.get(_core_name(tokens))
+        if exact:
+            return exact
+        hits = self.find_tickers(name) or self._fuzzy(name, cutoff=0.8, proper_nouns=False)
+        return hits[0] if hits else None
+
+
+def load_aliases(alias_path: str = DEFAULT_ALIAS_PATH) -> List[Tuple[str, str]]:
+    if not alias_path or not os.path.exists(alias_path):
+        return []
+    with open(alias_path, newline="", encoding="utf-8") as f:
+        return [(r.get("alias", ""), r.get("ticker", "")) for r in csv.DictReader(f)]
+
+
+_default_index: Optional[EntityIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_entity_index(con=None) -> EntityIndex:
+    """
+    Shared index for the process.
+    Built from the DuckDB table when a connection is available, else from the CSV.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                if con is not None:
+                    try:
+                        _default_index = EntityIndex.from_duckdb(con)
+                    except Exception:
+                        _default_index = EntityIndex.from_csv()
+                else:
+                    _default_index = EntityIndex.from_csv()
+    return _default_index
+
+
+def set_entity_index(index: Optional[EntityIndex]):
+    global _default_index
+    with _default_lock:
+        _default_index = index
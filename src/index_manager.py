@@ -0,0 +1,438 @@
+# src/index_manager.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+INDEX_ROOT = "chroma_store"
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+# A version directory without a manifest this old is a crashed build, not one in progress.
+STALE_BUILD_S = 24 * 3600
+
+
+def docs_fingerprint(pdf_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """(name, size, mtime_ns) for every PDF; changes whenever a filing is added/replaced/removed."""
+    if not os.path.isdir(pdf_dir):
+        return ()
+    out = []
+    for fn in sorted(os.listdir(pdf_dir)):
+        if fn.lower().endswith(".pdf"):
+            st = os.stat(os.path.join(pdf_dir, fn))
+            out.append((fn, st.st_size, st.st_mtime_ns))
+    return tuple(out)
+
+
+def read_pointer(root: str = INDEX_ROOT) -> Optional[str]:
+    """Path of the active index version, or None if the store is not versioned."""
+    try:
+        with open(os.path.join(root, POINTER_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, name) if name else None
+
+
+def _pointer_version(root: str) -> int:
+    path = read_pointer(root)
+    m = _VERSION_RE.match(os.path.basename(path)) if path else None
+    return int(m.group(1)) if m else 0
+
+
+def _reserve_version(root: str, after: int) -> int:
+    """
+    Claim the next free v<N> by creating its directory. os.mkdir is atomic,
+    so two processes building at once (app watcher + build_rag.py) never
+    get the same directory.
+    """
+    existing = [int(m.group(1)) for m in map(_VERSION_RE.match, os.listdir(root)) if m]
+    version = max([*existing, after]) + 1
+    while True:
+        try:
+            os.mkdir(os.path.join(root, f"v{version}"))
+            return version
+        except FileExistsError:
+            version += 1
+
+
+def _write_pointer(root: str, name: str):
+    tmp = os.path.join(root, f".{POINTER_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, POINTER_FILE))  # atomic on POSIX and Windows
+
+
+def _warm(vectordb):
+    """Run one query so the first user query on a new version does not pay the index load."""
+    try:
+        vectordb.similarity_search("warmup", k=1)
+    except Exception:
+        pass
+    return vectordb
+
+
+class IndexSnapshot:
+    """One immutable index version. Queries hold a snapshot for their whole lifetime."""
+
+    __slots__ = ("version", "path", "vectordb", "refs")
+
+    def __init__(self, version: int, path: str, vectordb):
+        self.version = version
+        self.path = path
+        self.vectordb = vectordb
+        self.refs = 0
+
+
+class IndexManager:
+    """
+    Versioned vector index with hot reload.
+
+    Each build goes to a fresh `chroma_store/v<N>` directory in a background
+    thread; when it is complete, the `CURRENT` pointer file is replaced
+    atomically and new queries pick up the new snapshot. Queries already
+    running keep the snapshot they acquired. Old versions beyond `keep` are
+    deleted once no query holds them.
+
+    Digests (src/digests.py) of tickers whose PDF is unchanged are copied
+    into each new version; with `refresh_digests` the dropped ones are
+    rebuilt in the background at batch priority after the swap.
+    """
+
+    def __init__(
+        self,
+        embedding_fn,
+        root: str = INDEX_ROOT,
+        pdf_dir: str = "docs",
+        builder: Optional[Callable] = None,
+        loader: Optional[Callable] = None,
+        keep: int = 2,
+        refresh_digests: bool = False,
+    ):
+        from src.rag import build_vectorstore, load_vectorstore
+
+        self.embedding_fn = embedding_fn
+        self.root = root
+        self.pdf_dir = pdf_dir
+        self.keep = keep
+        self.refresh_digests = refresh_digests
+        self._builder = builder or build_vectorstore
+        self._loader = loader or load_vectorstore
+
+        self._current: Optional[IndexSnapshot] = None
+        self._retired: Dict[int, IndexSnapshot] = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._build_thread: Optional[threading.Thread] = None
+        self._rebuild_requested = False
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_build_s: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.digest_carry: Optional[Dict[str, object]] = None
+        self._digest_thread: Optional[threading.Thread] = None
+        self._digest_refresh_requested = False
+
+    # ---------- versions on disk ----------
+
+    def _versions(self) -> Dict[int, str]:
+        out = {}
+        if os.path.isdir(self.root):
+            for fn in os.listdir(self.root):
+                m = _VERSION_RE.match(fn)
+                if m and os.path.isfile(os.path.join(self.root, fn, MANIFEST_FILE)):
+                    out[int(m.group(1))] = os.path.join(self.root, fn)
+        return out
+
+    def _manifest(self, path: str) -> dict:
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _load(self, path: str) -> IndexSnapshot:
+        m = _VERSION_RE.match(os.path.basename(path))
+        version = int(m.group(1)) if m else 0
+        return IndexSnapshot(version, path, _warm(self._loader(self.embedding_fn, path)))
+
+    # ---------- public ----------
+
+    @property
+    def version(self) -> Optional[int]:
+        snap = self._current
+        return snap.version if snap else None
+
+    def current(self) -> IndexSnapshot:
+        snap = self._current
+        if snap is None:
+            raise RuntimeError("Index not loaded; call load_or_build() first.")
+        return snap
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexSnapshot]:
+        """Pin the active snapshot for the duration of one query."""
+        with self._lock:
+            snap = self.current()
+            snap.refs += 1
+        try:
+            yield snap
+        finally:
+            with self._lock:
+                snap.refs -= 1
+            self._prune()
+
+    def load_or_build(self) -> IndexSnapshot:
+        """
+        Load the version named by CURRENT. A pre-versioning store (chroma.sqlite3
+        directly in the root) is served as version 0. Builds v1 if nothing exists.
+        """
+        path = read_pointer(self.root)
+        if path and os.path.isdir(path):
+            self._current = self._load(path)
+        elif os.path.exists(os.path.join(self.root, "chroma.sqlite3")):
+            self._current = IndexSnapshot(0, self.root, _warm(self._loader(self.embedding_fn, self.root)))
+        else:
+            self.rebuild()
+
+        self._prune_disk()
+        if self._is_stale():
+            self.rebuild_async()
+        return self._current
+
+    def rebuild(self) -> IndexSnapshot:
+        """Build a new version synchronously and swap it in."""
+        with self._build_lock:
+            return self._build_and_swap()
+
+    def rebuild_async(self) -> threading.Thread:
+        """
+        Start a background build. If one is already running, another build is
+        queued to start after it (so changes made mid-build are not missed).
+        """
+        with self._lock:
+            if self._build_thread is not None and self._build_thread.is_alive():
+                self._rebuild_requested = True
+                return self._build_thread
+            self._build_thread = threading.Thread(target=self._build_loop, name="index-build", daemon=True)
+            self._build_thread.start()
+            return self._build_thread
+
+    def start_watcher(self, interval: float = 5.0) -> threading.Thread:
+        """
+        Poll `pdf_dir` and the CURRENT pointer. A docs change (stable across
+        two polls, so half-copied files are skipped) triggers a rebuild; a
+        pointer moved by another process (e.g. build_rag.py) is hot-loaded.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="index-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        snap = self._current
+        return {
+            "version": snap.version if snap else None,
+            "path": snap.path if snap else None,
+            "building": bool(self._build_thread and self._build_thread.is_alive()),
+            "retired_in_use": {v: s.refs for v, s in self._retired.items() if s.refs},
+            "last_build_s": self.last_build_s,
+            "last_error": self.last_error,
+            "digests": self._digest_status(snap),
+        }
+
+    def _digest_status(self, snap: Optional[IndexSnapshot]) -> dict:
+        from src.digests import get_digest_store, pdf_tickers
+
+        store = get_digest_store(snap.path) if snap else None
+        try:
+            missing = sorted(set(pdf_tickers(self.pdf_dir)) - set(store.digests if store else ()))
+        except OSError:
+            missing = []
+        return {
+            "available": store is not None,
+            "tickers": len(store.digests) if store else 0,
+            "built_at": store.data.get("built_at") if store else None,
+            "missing": missing,
+            "last_carry": self.digest_carry,
+            "refreshing": bool(self._digest_thread and self._digest_thread.is_alive()),
+        }
+
+    # ---------- internals ----------
+
+    def _is_stale(self) -> bool:
+        snap = self._current
+        if snap is None:
+            return True
+        recorded = self._manifest(snap.path).get("docs")
+        return recorded is None or [tuple(x) for x in recorded] != list(docs_fingerprint(self.pdf_dir))
+
+    def _build_loop(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:  # keep serving the old version
+                self.last_error = f"{type(e).__name__}: {e}"
+            with self._lock:
+                if not self._rebuild_requested:
+                    return
+                self._rebuild_requested = False
+
+    def _build_and_swap(self) -> IndexSnapshot:
+        t0 = time.perf_counter()
+        os.makedirs(self.root, exist_ok=True)
+        version = _reserve_version(self.root, self.version or 0)
+        name = f"v{version}"
+        path = os.path.join(self.root, name)
+
+        fingerprint = docs_fingerprint(self.pdf_dir)
+        try:
+            vectordb = _warm(self._builder(self.pdf_dir, self.embedding_fn, path))
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        self._carry_digests(path)
+        # The manifest marks the version as complete; it is written last.
+        with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "built_at": time.time(), "docs": fingerprint}, f)
+
+        # Another process may have finished a newer build meanwhile; never move the pointer back.
+        if _pointer_version(self.root) < version:
+            _write_pointer(self.root, name)
+        self._swap(IndexSnapshot(version, path, vectordb))
+        self.last_build_s = round(time.perf_counter() - t0, 2)
+        self.last_error = None
+        if self.refresh_digests:
+            self._start_digest_refresh()
+        return self._current
+
+    def _carry_digests(self, path: str):
+        """Copy still-valid digests from the active version; a failure only costs digests."""
+        from src.digests import carry_over_digests
+
+        snap = self._current
+        old = snap.path if snap else read_pointer(self.root)
+        try:
+            result = carry_over_digests(old, path, self.pdf_dir)
+            self.digest_carry = {"from": os.path.basename(old or ""), "to": os.path.basename(path), **result}
+        except Exception as e:
+            self.digest_carry = None
+            self.last_error = f"digest carry-over: {type(e).__name__}: {e}"
+
+    def _start_digest_refresh(self):
+        """Like rebuild_async: a swap during a running refresh queues one more pass."""
+        with self._lock:
+            if self._digest_thread is not None and self._digest_thread.is_alive():
+                self._digest_refresh_requested = True
+                return
+            self._digest_thread = threading.Thread(target=self._digest_loop, name="digest-refresh", daemon=True)
+            self._digest_thread.start()
+
+    def _digest_loop(self):
+        from src.digests import build_digests, get_digest_store, merge_digests, pdf_tickers
+
+        while True:
+            try:
+                with self.acquire() as snap:
+                    store = get_digest_store(snap.path)
+                    missing = sorted(set(pdf_tickers(self.pdf_dir)) - set(store.digests if store else ()))
+                    if missing:
+                        merge_digests(snap.path, build_digests(snap.vectordb, missing, pdf_dir=self.pdf_dir))
+            except Exception as e:
+                self.last_error = f"digest refresh: {type(e).__name__}: {e}"
+            with self._lock:
+                if not self._digest_refresh_requested:
+                    return
+                self._digest_refresh_requested = False
+
+    def _swap(self, snap: IndexSnapshot):
+        with self._lock:
+            old, self._current = self._current, snap
+            if old is not None and old.version != snap.version:
+                self._retired[old.version] = old
+        self._prune()
+
+    def _prune(self):
+        """Delete retired versions outside the last `keep` that nobody holds."""
+        with self._lock:
+            if self._current is None:
+                return
+            cutoff = self._current.version - self.keep + 1
+            doomed = [
+                s for v, s in self._retired.items()
+                if v < cutoff and s.refs == 0
+            ]
+            for s in doomed:
+                del self._retired[s.version]
+        for s in doomed:
+            # Release mmaps and file handles first; on Windows rmtree fails on open files,
+            # and elsewhere the deleted files would stay mapped until the snapshot is collected.
+            close = getattr(s.vectordb, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+            s.vectordb = None
+            if s.path != self.root:  # never delete a legacy root store
+                shutil.rmtree(s.path, ignore_errors=True)
+
+    def _prune_disk(self):
+        """
+        Remove versions left on disk by earlier runs outside the last `keep`,
+        and crashed builds (no manifest) older than STALE_BUILD_S. Recent
+        manifest-less directories may be another process's build in progress.
+        """
+        cutoff = self._current.version - self.keep + 1
+        for v, path in self._versions().items():
+            if v < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        now = time.time()
+        for fn in os.listdir(self.root):
+            path = os.path.join(self.root, fn)
+            if (
+                _VERSION_RE.match(fn)
+                and not os.path.isfile(os.path.join(path, MANIFEST_FILE))
+                and now - os.path.getmtime(path) > STALE_BUILD_S
+            ):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _watch(self, interval: float):
+        seen = docs_fingerprint(self.pdf_dir)
+        pending = None
+        while not self._stop.wait(interval):
+            try:
+                pointer = read_pointer(self.root)
+                snap = self._current
+                building = self._build_thread is not None and self._build_thread.is_alive()
+                if pointer and snap and pointer != snap.path and not building and os.path.isdir(pointer):
+                    loaded = self._load(pointer)
+                    if loaded.version > snap.version:
+                        self._swap(loaded)
+
+                now = docs_fingerprint(self.pdf_dir)
+                if now != seen:
+                    if now == pending:
+                        seen, pending = now, None
+                        self.rebuild_async()
+                    else:
+                        pending = now
+                else:
+                    pending = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
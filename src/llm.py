@@ -22,10 +22,18 @@
 from __future__ import annotations
 
 import os
+import threading
 from typing import List, Dict, Optional
 
 from openai import OpenAI
 
+from src.llm_scheduler import (
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    estimate_tokens,
+    request_key,
+)
+
 
 def _get_env(name: str, default: Optional[str] = None) -> str:
     """Get environment variable or raise a helpful error."""
@@ -38,7 +46,10 @@ def _get_env(name: str, default: Optional[str] = None) -> str:
     return val
 
 
-def get_client() -> OpenAI:
+_clients: Dict[tuple, OpenAI] = {}
+
+
+def get_client(scheduled: bool = False) -> OpenAI:
     """
     Returns an OpenAI-compatible client configured for Groq.
 
@@ -47,11 +58,66 @@ def get_client() -> OpenAI:
 
     Optional:
       - GROQ_BASE_URL (defaults to Groq OpenAI-compatible endpoint)
+
+    For scheduled calls client-side retries are disabled: 429s are retried
+    by the scheduler, which also pauses every other queued request. The
+    LLM_SCHEDULER=0 path keeps the SDK's default retries.
     """
     api_key = _get_env("GROQ_API_KEY")
     base_url = os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
 
-    return OpenAI(api_key=api_key, base_url=base_url)
+    # Reuse the client (and its connection pool) across calls and threads.
+    key = (api_key, base_url, scheduled)
+    client = _clients.get(key)
+    if client is None:
+        if scheduled:
+            client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        else:
+            client = OpenAI(api_key=api_key, base_url=base_url)
+        _clients[key] = client
+    return client
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Process-wide scheduler shared by every Streamlit session.
+
+    Optional:
+      - LLM_WORKERS (default 4), LLM_MAX_QUEUE (default 64)
+      - LLM_RPM (default 30), LLM_TPM (default 6000): the Groq quotas
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    workers=int(os.environ.get("LLM_WORKERS", "4")),
+                    max_queue=int(os.environ.get("LLM_MAX_QUEUE", "64")),
+                    rpm=float(os.environ.get("LLM_RPM", "30")),
+                    tpm=float(os.environ.get("LLM_TPM", "6000")),
+                )
+    return _scheduler
+
+
+def _chat_completion_upstream(
+    messages: List[Dict[str, str]],
+    model_name: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    scheduled: bool = True,
+) -> str:
+    client = get_client(scheduled)
+    resp = client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    return resp.choices[0].message.content
 
 
 def chat_completion(
@@ -59,21 +125,29 @@ def chat_completion(
     model: Optional[str] = None,
     temperature: float = 0.0,
     max_tokens: Optional[int] = None,
+    priority: int = PRIORITY_INTERACTIVE,
 ) -> str:
     """
     Simple chat wrapper:
       messages = [{"role":"user","content":"..."}, ...]
-    """
-    client = get_client()
 
+    Calls go through the shared scheduler (set LLM_SCHEDULER=0 to bypass).
+    Deterministic calls (temperature 0) with identical prompts are coalesced.
+    Use priority=PRIORITY_BATCH for offline jobs so they yield to users.
+    """
     # Allow model override via env var or function arg
     model_name = model or os.environ.get("GROQ_MODEL", "llama-3.1-8b-instant")
 
-    resp = client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    return resp.choices[0].message.content
+    if os.environ.get("LLM_SCHEDULER", "1") == "0":
+        return _chat_completion_upstream(messages, model_name, temperature, max_tokens, scheduled=False)
 
+    key = None
+    if temperature == 0:
+        key = request_key(messages, model=model_name, max_tokens=max_tokens)
+
+    return get_scheduler().call(
+        lambda: _chat_completion_upstream(messages, model_name, temperature, max_tokens),
+        key=key,
+        priority=priority,
+        est_tokens=estimate_tokens(messages, max_tokens),
+    )
@@ -0,0 +1,276 @@
+# src/llm_scheduler.py
+from __future__ import annotations
+
+import heapq
+import hashlib
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the scheduler queue is at capacity (backpressure)."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `per_minute / 60` per second.
+    A non-positive rate disables the limit.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # Requests larger than the bucket can never fit; let them drain it instead.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, now: float):
+        """Empty the bucket (used when upstream answers 429 anyway)."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Job:
+    __slots__ = ("key", "fn", "est_tokens", "future", "enqueued", "claimed", "priority")
+
+    def __init__(self, key, fn, est_tokens, priority):
+        self.key = key
+        self.fn = fn
+        self.est_tokens = est_tokens
+        self.priority = priority
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+        self.claimed = False
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Rough prompt + completion estimate (~4 chars per token)."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + (max_tokens or 512)
+
+
+def request_key(messages: List[Dict[str, str]], **params: Any) -> str:
+    payload = json.dumps({"messages": messages, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds to back off if `exc` is an upstream 429, else None."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", 1.0)), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class LLMScheduler:
+    """
+    Sits in front of the upstream LLM call and provides:
+      - single-flight: identical in-flight requests share one upstream call
+      - token buckets for requests/min and tokens/min
+      - a priority queue (interactive before batch) served by a worker pool
+      - backpressure: submit() raises QueueFullError when the queue is full;
+        batch jobs are refused earlier so interactive traffic keeps headroom
+      - 429 handling: back off for Retry-After and pause all workers
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 64,
+        batch_queue_limit: Optional[int] = None,
+        rpm: float = 30,
+        tpm: float = 6000,
+        max_retries: int = 3,
+    ):
+        self.max_queue = max_queue
+        self.batch_queue_limit = batch_queue_limit if batch_queue_limit is not None else max_queue // 2
+        self.max_retries = max_retries
+
+        self._rpm = TokenBucket(rpm)
+        self._tpm = TokenBucket(tpm)
+        self._paused_until = 0.0
+
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._inflight: Dict[str, _Job] = {}
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "retries_429": 0,
+            "max_queue_depth": 0,
+            "throttle_wait_s": 0.0,
+        }
+        self._wait_ms: Dict[int, List[float]] = {}
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"llm-scheduler-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ---------- public ----------
+
+    def submit(
+        self,
+        fn: Callable[[], Any],
+        key: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        est_tokens: int = 0,
+    ) -> Future:
+        with self._cond:
+            self._stats["submitted"] += 1
+
+            existing = self._inflight.get(key) if key else None
+            if existing is not None:
+                self._stats["coalesced"] += 1
+                # A more urgent duplicate promotes the queued job.
+                if not existing.claimed and priority < existing.priority:
+                    existing.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), existing))
+                return existing.future
+
+            limit = self.max_queue if priority <= PRIORITY_INTERACTIVE else self.batch_queue_limit
+            if self._queued >= limit:
+                self._stats["rejected"] += 1
+                raise QueueFullError(
+                    f"LLM queue full ({self._queued} waiting, limit {limit} for priority {priority})"
+                )
+
+            job = _Job(key, fn, est_tokens, priority)
+            if key:
+                self._inflight[key] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._queued += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+            self._cond.notify()
+            return job.future
+
+    def call(self, fn: Callable[[], Any], **kwargs) -> Any:
+        return self.submit(fn, **kwargs).result()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["queue_depth"] = self._queued
+            out["running"] = self._running
+            out["throttle_wait_s"] = round(out["throttle_wait_s"], 3)
+            out["queue_wait_ms_avg"] = {
+                p: round(sum(v) / len(v), 1) for p, v in self._wait_ms.items() if v
+            }
+            return out
+
+    # ---------- worker ----------
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, _, job = heapq.heappop(self._heap)
+                    if job.claimed:
+                        continue  # stale entry left behind by a priority promotion
+                    job.claimed = True
+                    self._queued -= 1
+                    self._running += 1
+                    waits = self._wait_ms.setdefault(job.priority, [])
+                    waits.append((time.monotonic() - job.enqueued) * 1000)
+                    del waits[:-1000]
+                    return job
+                self._cond.wait()
+
+    def _throttle(self, est_tokens: int):
+        """Block until both buckets (and any 429 pause) allow the request."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._rpm.wait_time(1, now),
+                    self._tpm.wait_time(est_tokens, now),
+                )
+                if wait <= 0:
+                    self._rpm.consume(1, now)
+                    self._tpm.consume(est_tokens, now)
+                    return
+                self._stats["throttle_wait_s"] += wait
+            time.sleep(wait)
+
+    def _run(self, job: _Job) -> Any:
+        attempt = 0
+        while True:
+            self._throttle(job.est_tokens)
+            with self._lock:
+                self._stats["upstream_calls"] += 1
+            try:
+                return job.fn()
+            except Exception as e:
+                backoff = _retry_after(e)
+                if backoff is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._stats["retries_429"] += 1
+                    now = time.monotonic()
+                    self._paused_until = max(self._paused_until, now + backoff)
+                    self._rpm.drain(now)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            try:
+                result = self._run(job)
+            except BaseException as e:
+                ok, payload = False, e
+            else:
+                ok, payload = True, result
+
+            with self._lock:
+                self._running -= 1
+                if job.key and self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                self._stats["completed" if ok else "failed"] += 1
+
+            if ok:
+                job.future.set_result(payload)
+            else:
+                job.future.set_exception(payload)
@@ -1,31 +1,31 @@
-import re
-
-TICKERS = ["AAPL","MSFT","GOOGL","AMZN","NVDA","TSLA","META"]
+from src.entities import get_entity_index
 
 def extract_ticker(text: str):
-    for t in TICKERS:
-        if re.search(rf"\b{t}\b", text.upper()):
-            return t
-    return None
+    # Exact matches only: fuzzy matching turns words like "apply" into tickers
+    # and would break follow-up detection.
+    hits = get_entity_index().find_tickers(text, fuzzy=False)
+    return hits[0] if hits else None
 
-def resolve_followup(question: str, memory: dict) -> str:
-    # If user didn't mention a company/ticker, attach the last one
-    if extract_ticker(question) is None and memory.get("last_ticker"):
-        return f"{question} (Company ticker context: {memory['last_ticker']})"
+def resolve_followup(question: str, memory) -> str:
+    # If user didn't mention a company/ticker, attach the last one(s)
+    if extract_ticker(question) is None:
+        tickers = memory.get("last_tickers") or ([memory["last_ticker"]] if memory.get("last_ticker") else [])
+        if tickers:
+            return f"{question} (Company ticker context: {', '.join(tickers)})"
     return question
 
+def conversation_context(question: str, memory, max_tokens: int = 300) -> str:
+    # Follow-ups (no company named) get the compact history of a Session
+    # (see src/session_store.py), bounded to max_tokens; plain dicts have none.
+    if extract_ticker(question) is not None or not hasattr(memory, "context"):
+        return ""
+    ctx = memory.context(max_tokens)
+    return f"\n(Conversation so far:\n{ctx})" if ctx else ""
+
 def infer_ticker_from_name(con, name: str) -> str | None:
-    q = f"""
-    SELECT ticker
-    FROM financial_overview
-    WHERE company_name ILIKE '%{name}%'
-    LIMIT 1;
-    """
+    # Resolved against the shared entity index (built from financial_overview
+    # plus data/entity_aliases.csv) instead of an ILIKE scan per lookup.
     try:
-        df = con.execute(q).fetchdf()
-        if len(df) > 0:
-            return str(df.iloc[0]["ticker"])
+        return get_entity_index(con).resolve_name(name)
     except Exception:
-        pass
-    return None
-
+        return None
@@ -0,0 +1,108 @@
+# src/pdf_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+from langchain_core.documents import Document
+
+CACHE_DIR = "pdf_cache"
+
+# Bump when the extraction itself changes so old cache files are ignored.
+EXTRACTOR_VERSION = "pypdf-1"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, f"{digest}.{EXTRACTOR_VERSION}.parquet")
+
+
+def _parse_pdf(pdf_path: str) -> pd.DataFrame:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(pdf_path).load()
+    return pd.DataFrame({
+        "page": [int(d.metadata.get("page", i)) for i, d in enumerate(pages)],
+        "text": [d.page_content for d in pages],
+        # Remaining loader metadata (page_label, total_pages, producer, ...) as JSON.
+        "metadata": [
+            json.dumps({k: v for k, v in d.metadata.items() if k not in ("page", "source")}, default=str)
+            for d in pages
+        ],
+    })
+
+
+def extract_pages(pdf_path: str, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Per-page text for one PDF, parsed once and cached as Parquet keyed by the
+    file's SHA-256. Columns: page, text, metadata (JSON).
+    """
+    digest = file_sha256(pdf_path)
+    path = _cache_path(cache_dir, digest)
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    df = _parse_pdf(pdf_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, path)
+    return df
+
+
+def load_pdf_documents(
+    pdf_dir: str,
+    ticker_to_name: Optional[Dict[str, str]] = None,
+    cache_dir: str = CACHE_DIR,
+) -> List[Document]:
+    """
+    One Document per PDF page (from the extraction cache), with the
+    ticker/company_name/source metadata build_vectorstore filters on.
+    """
+    ticker_to_name = ticker_to_name or {}
+    docs: List[Document] = []
+    for fn in sorted(os.listdir(pdf_dir)):
+        if not fn.lower().endswith(".pdf"):
+            continue
+
+        ticker = os.path.splitext(fn)[0].upper()  # "MSFT" from "MSFT.pdf"
+        company_name = ticker_to_name.get(ticker, ticker)
+
+        df = extract_pages(os.path.join(pdf_dir, fn), cache_dir)
+        for page, text, meta in zip(df["page"], df["text"], df["metadata"]):
+            md = json.loads(meta) if meta else {}
+            md.update({
+                "page": int(page),
+                "ticker": ticker,
+                "company_name": company_name,
+                "source": f"docs/{fn}",
+            })
+            docs.append(Document(page_content=text, metadata=md))
+    return docs
+
+
+def prune_cache(pdf_dir: str, cache_dir: str = CACHE_DIR) -> int:
+    """Delete cache files whose PDF no longer exists (or changed). Returns count removed."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    live = {
+        os.path.basename(_cache_path(cache_dir, file_sha256(os.path.join(pdf_dir, fn))))
+        for fn in os.listdir(pdf_dir)
+        if fn.lower().endswith(".pdf")
+    }
+    removed = 0
+    for fn in os.listdir(cache_dir):
+        if fn.endswith(".parquet") and fn not in live:
+            os.remove(os.path.join(cache_dir, fn))
+            removed += 1
+    return removed
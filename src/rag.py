@@ -1,51 +1,77 @@
 # src/rag.py
 import os
 import pandas as pd
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 
-def build_vectorstore(pdf_dir: str, embedding_fn, persist_dir: str = "chroma_store"):
+from src.chunk_store import ChunkRecord, ChunkStore, LazyChunkIndex, write_lazy_index
+from src.entities import get_entity_index
+from src.index_manager import read_pointer
+from src.pdf_cache import CACHE_DIR, load_pdf_documents
+
+def _ticker_to_name(csv_path: str = "data/financial_data.csv") -> dict:
     # Optional: map ticker -> company_name using your CSV
-    ticker_to_name = {}
-    csv_path = "data/financial_data.csv"
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-        ticker_to_name = dict(zip(df["ticker"].astype(str), df["company_name"].astype(str)))
-
-    all_docs = []
-    for fn in os.listdir(pdf_dir):
-        if not fn.lower().endswith(".pdf"):
-            continue
-
-        ticker = os.path.splitext(fn)[0].upper()  # "MSFT" from "MSFT.pdf"
-        company_name = ticker_to_name.get(ticker, ticker)
-
-        loader = PyPDFLoader(os.path.join(pdf_dir, fn))
-        docs = loader.load()
-
-        # add metadata for filtering later
-        for d in docs:
-            d.metadata["ticker"] = ticker
-            d.metadata["company_name"] = company_name
-            d.metadata["source"] = f"docs/{fn}"  # keep your existing style
-
-        all_docs.extend(docs)
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=900, chunk_overlap=150)
-    chunks = splitter.split_documents(all_docs)
-
-    vectordb = Chroma.from_documents(
-        chunks,
-        embedding_fn,
-        persist_directory=persist_dir,
-    )
+    if not os.path.exists(csv_path):
+        return {}
+    df = pd.read_csv(csv_path)
+    return dict(zip(df["ticker"].astype(str), df["company_name"].astype(str)))
+
+
+def split_documents(docs, chunk_size: int = 900, chunk_overlap: int = 150):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_documents(docs)
+
+
+def build_vectorstore(
+    pdf_dir: str,
+    embedding_fn,
+    persist_dir: str = "chroma_store",
+    chunk_size: int = 900,
+    chunk_overlap: int = 150,
+    cache_dir: str = CACHE_DIR,
+    batch_size: int = 32,
+    lazy_text: bool = True,
+):
+    # Page text comes from the extraction cache; PDFs are only parsed when new or changed.
+    all_docs = load_pdf_documents(pdf_dir, _ticker_to_name(), cache_dir)
+    chunks = split_documents(all_docs, chunk_size, chunk_overlap)
+
+    if lazy_text:
+        # Vectors + ids/metadata in Chroma, compressed text in a memory-mapped chunk store
+        return write_lazy_index(chunks, embedding_fn, persist_dir, batch_size)
+
+    # Insert in small batches: one large add holds the GIL for over a second,
+    # stalling queries served from the same process during a background rebuild.
+    vectordb = Chroma(persist_directory=persist_dir, embedding_function=embedding_fn)
+    for i in range(0, len(chunks), batch_size):
+        vectordb.add_documents(chunks[i : i + batch_size])
     return vectordb
 
 def load_vectorstore(embedding_fn, persist_dir: str = "chroma_store"):
+    # A versioned store (see src/index_manager.py) points at its active version.
+    persist_dir = read_pointer(persist_dir) or persist_dir
+    if ChunkStore.exists(persist_dir):
+        return LazyChunkIndex(persist_dir, embedding_fn)
     return Chroma(persist_directory=persist_dir, embedding_function=embedding_fn)
 
 
+def _search(vectordb, query: str, k: int, filter: dict | None = None):
+    """
+    ChunkRecords (ids + metadata, no text) from a LazyChunkIndex, Documents
+    from a plain Chroma store. Use _hydrate() on whatever is finally returned.
+    """
+    if isinstance(vectordb, LazyChunkIndex):
+        return vectordb.search_records(query, k=k, filter=filter)
+    if filter:
+        return vectordb.similarity_search(query, k=k, filter=filter)
+    return vectordb.similarity_search(query, k=k)
+
+
+def _hydrate(vectordb, items):
+    if isinstance(vectordb, LazyChunkIndex):
+        return vectordb.hydrate(items)
+    return items
+
 
 def retrieve(vectordb, query: str, k: int = 4, source_equals: str | None = None):
     """
@@ -59,20 +85,16 @@ def retrieve(vectordb, query: str, k: int = 4, source_equals: str | None = None)
     if source_equals:
         # Try Chroma metadata filtering first
         try:
-            docs = vectordb.similarity_search(
-                query,
-                k=k,
-                filter={"source": source_equals},
-            )
-            return dedup_docs(docs)
+            docs = _search(vectordb, query, k, filter={"source": source_equals})
+            return _hydrate(vectordb, dedup_docs(docs))
         except Exception:
             # Fallback: retrieve more, then filter in Python
-            docs = vectordb.similarity_search(query, k=max(k * 5, 20))
+            docs = _search(vectordb, query, max(k * 5, 20))
             docs = [d for d in docs if d.metadata.get("source") == source_equals]
-            return dedup_docs(docs)[:k]
+            return _hydrate(vectordb, dedup_docs(docs)[:k])
 
-    docs = vectordb.similarity_search(query, k=k)
-    return dedup_docs(docs)
+    docs = _search(vectordb, query, k)
+    return _hydrate(vectordb, dedup_docs(docs))
 
 
 import re
@@ -82,15 +104,29 @@ def dedup_docs(docs):
     seen = set()
     out = []
     for d in docs:
-        key = (d.metadata.get("source"), d.metadata.get("page"), d.page_content[:120])
+        if isinstance(d, ChunkRecord):
+            key = (d.source, d.page, d.text_id)  # text_id is shared by chunks with identical text
+        else:
+            key = (d.metadata.get("source"), d.metadata.get("page"), d.page_content[:120])
         if key not in seen:
             out.append(d)
             seen.add(key)
     return out
 
 def infer_tickers_from_question(question: str, known_tickers: list[str]) -> list[str]:
-    q = question.upper()
-    hits = [t for t in known_tickers if re.search(rf"\b{re.escape(t)}\b", q)]
+    """
+    Tickers mentioned in the question (by ticker, company name or alias),
+    restricted to `known_tickers`, in order of appearance.
+    """
+    known = set(known_tickers)
+    index = get_entity_index()
+    hits = [t for t in index.find_tickers(question) if t in known]
+
+    # Tickers present in the vector store but missing from the entity index
+    unindexed = known - index.tickers - set(hits)
+    if unindexed:
+        words = set(re.findall(r"[A-Z0-9.&]+", question.upper()))
+        hits.extend(t for t in known_tickers if t in unindexed and t in words)
     return hits
 
 def infer_ticker_from_retrieved_docs(docs) -> str | None:
@@ -106,8 +142,9 @@ def retrieve_semantic_company(vectordb, query: str, k: int = 4, global_k: int =
     2) infer the most likely ticker
     3) retrieve again filtered to that ticker
     """
-    # Stage A: global retrieval
-    global_docs = vectordb.similarity_search(query, k=global_k)
+    # Stage A: global retrieval (records only on a LazyChunkIndex; text is
+    # fetched for the final top-k only)
+    global_docs = _search(vectordb, query, global_k)
     global_docs = dedup_docs(global_docs)
 
     # Try infer from question if possible
@@ -122,19 +159,16 @@ def retrieve_semantic_company(vectordb, query: str, k: int = 4, global_k: int =
 
     if not target_ticker:
         # No company inferred → return best global docs
-        return global_docs[:k], {"mode": "global", "target_ticker": None}
+        return _hydrate(vectordb, global_docs[:k]), {"mode": "global", "target_ticker": None}
 
     # Stage C: company-filtered retrieval
     try:
-        filtered = vectordb.similarity_search(
-            query, k=max(k * 2, 8),
-            filter={"ticker": target_ticker},
-        )
+        filtered = _search(vectordb, query, max(k * 2, 8), filter={"ticker": target_ticker})
         filtered = dedup_docs(filtered)[:k]
-        return filtered, {"mode": "filtered", "target_ticker": target_ticker}
+        return _hydrate(vectordb, filtered), {"mode": "filtered", "target_ticker": target_ticker}
     except Exception:
         # Fallback: filter in Python if metadata filter unsupported
         filtered = [d for d in global_docs if d.metadata.get("ticker") == target_ticker]
-        return filtered[:k], {"mode": "filtered_fallback", "target_ticker": target_ticker}
+        return _hydrate(vectordb, filtered[:k]), {"mode": "filtered_fallback", "target_ticker": target_ticker}
 
 
@@ -8,4 +8,11 @@ Columns:
 - pe_ratio (number)
 - revenue_2023_billions (number)
 - net_income_2023_billions (number)
-"""
\ No newline at end of file
+"""
+
+# Column names parsed from FIN_SCHEMA so validation and prompts share one source.
+FIN_COLUMNS = [
+    line.strip()[2:].split(" (", 1)[0]
+    for line in FIN_SCHEMA.splitlines()
+    if line.strip().startswith("- ")
+]
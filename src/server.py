@@ -0,0 +1,272 @@
+# src/server.py
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+
+from src.agent import answer
+from src.embed_batcher import EmbeddingBatcher
+from src.index_manager import IndexManager
+from src.llm import get_scheduler
+from src.llm_scheduler import QueueFullError
+from src.session_store import SessionStore
+from src.sql_validate import repair_stats
+
+STREAM_CHUNK_CHARS = 400
+
+
+class AnswerService:
+    """
+    Shared, warm resources plus a bounded worker pool for `answer()`.
+
+    - One DuckDB database; each worker thread uses its own cursor.
+    - One vector store / embedding model for all requests.
+    - At most `workers` answers run at once and `max_queue` wait; beyond
+      that requests are refused (HTTP 503) instead of piling up.
+    - Conversation state is a bounded Session per session id (LRU-evicted
+      SessionStore) and turns of the same session are serialized.
+    """
+
+    def __init__(
+        self,
+        con,
+        vectordb,
+        workers: int = 4,
+        max_queue: int = 32,
+        answer_fn: Callable = answer,
+        sessions: SessionStore | None = None,
+    ):
+        self.con = con
+        self.vectordb = vectordb
+        self.workers = workers
+        self.max_queue = max_queue
+        self.answer_fn = answer_fn
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer")
+        self._local = threading.local()
+        self._pending = 0
+        self._running = 0
+        self._running_lock = threading.Lock()
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self._latencies = deque(maxlen=2000)
+        self._started = time.time()
+        self._stats = {"requests": 0, "completed": 0, "rejected": 0, "errors": 0}
+
+    # ---------- worker side ----------
+
+    def _cursor(self):
+        cur = getattr(self._local, "cursor", None)
+        if cur is None:
+            cur = self.con.cursor()
+            self._local.cursor = cur
+        return cur
+
+    def _answer_sync(self, question: str, state, on_event: Optional[Callable] = None) -> Dict[str, Any]:
+        with self._running_lock:
+            self._running += 1
+        try:
+            return self.answer_fn(question, state, self._cursor(), self.vectordb, on_event=on_event)
+        finally:
+            with self._running_lock:
+                self._running -= 1
+
+    # ---------- request side ----------
+
+    def try_admit(self) -> bool:
+        if self._pending >= self.workers + self.max_queue:
+            self._stats["rejected"] += 1
+            return False
+        self._pending += 1
+        self._stats["requests"] += 1
+        return True
+
+    def queue_position(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    def session(self, session_id: str):
+        """
+        The session and its turn lock, pinned so it cannot be evicted (and
+        replaced by a fresh session with a new lock) while a turn waits or
+        runs. Release with `self.sessions.unpin(state)`.
+        """
+        state = self.sessions.pin(session_id)
+        if state.lock is None:
+            state.lock = asyncio.Lock()
+        return state, state.lock
+
+    async def run(self, question: str, session_id: str, on_event: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Run one admitted request; releases the admission slot when done.
+        `on_event` receives the agent's progress events (called from a worker thread).
+        """
+        t0 = time.perf_counter()
+        try:
+            state, lock = self.session(session_id)
+            try:
+                async with lock:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._pool, self._answer_sync, question, state, on_event)
+            finally:
+                self.sessions.unpin(state)
+            self._stats["completed"] += 1
+            return result
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            self._latencies.append((time.perf_counter() - t0) * 1000)
+
+    def metrics(self) -> Dict[str, Any]:
+        lat = sorted(self._latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(len(lat) * p))], 1) if lat else None
+
+        return {
+            **self._stats,
+            "in_flight": self._pending,
+            "running": self._running,
+            "queued": self.queue_position(),
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "sessions": self.sessions.stats(),
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+            "uptime_s": round(time.time() - self._started, 1),
+            "llm": get_scheduler().metrics(),
+            "sql_repair": repair_stats(),
+            "index": self.vectordb.status() if isinstance(self.vectordb, IndexManager) else None,
+            "embeddings": self._embedding_metrics(),
+        }
+
+    def _embedding_metrics(self):
+        emb = getattr(self.vectordb, "embedding_fn", None)
+        return emb.metrics() if isinstance(emb, EmbeddingBatcher) else None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ndjson(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+
+def _busy(reason: str) -> web.Response:
+    return web.json_response({"error": reason}, status=503, headers={"Retry-After": "1"})
+
+
+async def handle_answer(request: web.Request) -> web.StreamResponse:
+    """
+    POST /answer {"question": "...", "session_id": "..."}
+
+    Streams NDJSON events: queued, then the agent's progress events as each
+    stage finishes (route, sql, retrieved, digest), then delta* -> trace ->
+    done (or error). The answer text is generated in one LLM call, so its
+    deltas are chunks of the finished text, not model tokens.
+    Add ?stream=0 for a single JSON response instead.
+    """
+    svc: AnswerService = request.app["service"]
+    try:
+        body = await request.json()
+    except ValueError:  # JSONDecodeError, or UnicodeDecodeError for a body that is not UTF-8
+        return web.json_response({"error": "body must be UTF-8 JSON"}, status=400)
+    if not isinstance(body, dict):
+        return web.json_response({"error": "body must be a JSON object"}, status=400)
+
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return web.json_response({"error": "question must be a non-empty string"}, status=400)
+    question = question.strip()
+    session_id = body.get("session_id") or uuid.uuid4().hex
+    if not isinstance(session_id, str):
+        return web.json_response({"error": "session_id must be a string"}, status=400)
+
+    if not svc.try_admit():
+        return _busy("answer queue full")
+
+    if request.query.get("stream") == "0":
+        task = asyncio.ensure_future(svc.run(question, session_id))
+        try:
+            result = await task
+        except QueueFullError as e:
+            return _busy(str(e))
+        except Exception as e:
+            return web.json_response({"error": str(e), "session_id": session_id}, status=500)
+        return web.json_response({**result, "session_id": session_id}, dumps=lambda o: json.dumps(o, default=str))
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(
+        svc.run(question, session_id, on_event=lambda e: loop.call_soon_threadsafe(events.put_nowait, e))
+    )
+
+    resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await resp.prepare(request)
+    await resp.write(_ndjson({"event": "queued", "session_id": session_id, "position": svc.queue_position()}))
+
+    # Forward progress events while the answer is being computed.
+    while not task.done():
+        getter = asyncio.ensure_future(events.get())
+        done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            await resp.write(_ndjson(getter.result()))
+        else:
+            getter.cancel()
+    # Events scheduled just before the task finished
+    await asyncio.sleep(0)
+    while not events.empty():
+        await resp.write(_ndjson(events.get_nowait()))
+
+    try:
+        result = task.result()
+    except Exception as e:
+        status = 503 if isinstance(e, QueueFullError) else 500
+        await resp.write(_ndjson({"event": "error", "status": status, "error": str(e)}))
+        await resp.write_eof()
+        return resp
+
+    final = result.get("final", "")
+    for i in range(0, len(final), STREAM_CHUNK_CHARS):
+        await resp.write(_ndjson({"event": "delta", "text": final[i : i + STREAM_CHUNK_CHARS]}))
+    await resp.write(_ndjson({"event": "trace", "trace": result.get("trace", {})}))
+    await resp.write(_ndjson({"event": "done"}))
+    await resp.write_eof()
+    return resp
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    svc: AnswerService = request.app["service"]
+    return web.json_response({
+        "status": "ok",
+        "vectordb": svc.vectordb is not None,
+        "index_version": getattr(svc.vectordb, "version", None),
+        "in_flight": svc._pending,
+        "capacity": svc.workers + svc.max_queue,
+    })
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    svc: AnswerService = request.app["service"]
+    return web.json_response(svc.metrics())
+
+
+def create_app(service: AnswerService) -> web.Application:
+    app = web.Application()
+    app["service"] = service
+    app.router.add_post("/answer", handle_answer)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+
+    async def _on_cleanup(app):
+        app["service"].shutdown()
+
+    app.on_cleanup.append(_on_cleanup)
+    return app
@@ -0,0 +1,278 @@
+# src/session_store.py
+from __future__ import annotations
+
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Session object, its two deques and the ticker list, before any turns.
+_SESSION_OVERHEAD = 1600
+
+MAX_QUESTION_CHARS = 200
+MAX_SQL_CHARS = 400
+MAX_SUMMARY_TICKERS = 8
+
+
+def _tokens(text: str) -> int:
+    """Rough token count (~4 chars per token), as in llm_scheduler.estimate_tokens."""
+    return len(text) // 4 + 1
+
+
+class TurnRecord:
+    """
+    One answered turn, without the answer text: the resolved entities, the
+    SQL that ran and the cited chunks ("MSFT.pdf:12").
+    """
+
+    __slots__ = ("question", "tickers", "source", "sql", "citations", "ts", "nbytes")
+
+    def __init__(
+        self,
+        question: str,
+        tickers: Tuple[str, ...] = (),
+        source: str = "",
+        sql: Optional[str] = None,
+        citations: Tuple[str, ...] = (),
+        ts: Optional[float] = None,
+    ):
+        self.question = question[:MAX_QUESTION_CHARS]
+        self.tickers = tuple(tickers)
+        self.source = source
+        self.sql = sql[:MAX_SQL_CHARS] if sql else None
+        self.citations = tuple(citations)
+        self.ts = ts if ts is not None else time.time()
+        # Ticker strings are shared across records, so only the tuple slots count.
+        self.nbytes = (
+            sys.getsizeof(self) + 8  # + deque slot
+            + sys.getsizeof(self.question)
+            + sys.getsizeof(self.tickers)
+            + (sys.getsizeof(self.sql) if self.sql else 0)
+            + sys.getsizeof(self.citations) + sum(sys.getsizeof(c) for c in self.citations)
+            + 24  # ts float
+        )
+
+    @classmethod
+    def from_result(cls, question: str, tickers: Iterable[str], result: Dict[str, Any]) -> "TurnRecord":
+        trace = result.get("trace", {})
+        cites = tuple(dict.fromkeys(
+            f"{os.path.basename(str(c.get('source', '')))}:{c.get('page')}" for c in trace.get("citations", [])
+        ))
+        return cls(question, tuple(tickers), trace.get("source", ""), trace.get("sql"), cites)
+
+    def render(self) -> str:
+        parts = [f"Q: {self.question}"]
+        if self.tickers:
+            parts.append(f"companies={','.join(self.tickers)}")
+        if self.source:
+            parts.append(f"answered_from={self.source}")
+        if self.sql:
+            parts.append(f"sql={self.sql}")
+        if self.citations:
+            parts.append(f"cited={','.join(self.citations[:4])}")
+        return "; ".join(parts)
+
+
+class Session:
+    """
+    Bounded conversation state for one session.
+
+    Recent turns are kept as TurnRecords within `budget_bytes`; older turns
+    are folded into an incremental summary (companies seen + one short line
+    per turn) capped at `summary_tokens`. Also answers the `state.get(...)` /
+    `state[...] = ...` calls the agent makes on the old state dict.
+    """
+
+    __slots__ = ("budget_bytes", "summary_tokens", "turns", "summary_lines", "summary_tickers",
+                 "nbytes", "last_access", "lock", "pins", "_pinned_ticker")
+
+    def __init__(self, budget_bytes: int = 4096, summary_tokens: int = 200):
+        self.budget_bytes = budget_bytes
+        self.summary_tokens = summary_tokens
+        self.turns: deque = deque()
+        self.summary_lines: deque = deque()
+        self.summary_tickers: List[str] = []
+        self.nbytes = _SESSION_OVERHEAD
+        self.last_access = time.monotonic()
+        self.lock = None  # set by the HTTP service (asyncio.Lock per session)
+        self.pins = 0  # turns waiting or running (SessionStore.pin); never evicted while > 0
+        self._pinned_ticker: Optional[str] = None
+
+    # ---------- dict-style access used by agent/memory ----------
+
+    @property
+    def last_tickers(self) -> Tuple[str, ...]:
+        """Companies of the most recent turn that resolved any."""
+        if self._pinned_ticker:
+            return (self._pinned_ticker,)
+        for turn in reversed(self.turns):
+            if turn.tickers:
+                return turn.tickers
+        return tuple(self.summary_tickers[-1:])
+
+    def get(self, key: str, default=None):
+        if key == "last_tickers":
+            return list(self.last_tickers) or default
+        if key == "last_ticker":
+            tickers = self.last_tickers
+            return tickers[0] if tickers else default
+        return default
+
+    def __setitem__(self, key: str, value):
+        if key != "last_ticker":
+            raise KeyError(f"Session only tracks last_ticker, not {key!r}")
+        self._pinned_ticker = value
+
+    # ---------- turns ----------
+
+    def add_turn(self, turn: TurnRecord):
+        self._pinned_ticker = None  # the recorded turn now carries the tickers
+        self.turns.append(turn)
+        self.nbytes += turn.nbytes
+        while self.nbytes > self.budget_bytes and len(self.turns) > 1:
+            self._fold(self.turns.popleft())
+        # Still over (one large turn): give up the oldest summary lines.
+        while self.nbytes > self.budget_bytes and self.summary_lines:
+            self.nbytes -= sys.getsizeof(self.summary_lines.popleft()) + 8
+
+    def _fold(self, turn: TurnRecord):
+        """Move one turn into the summary, keeping the summary within its token budget."""
+        self.nbytes -= turn.nbytes
+        for t in turn.tickers:
+            if t in self.summary_tickers:
+                self.summary_tickers.remove(t)
+            self.summary_tickers.append(t)
+        del self.summary_tickers[:-MAX_SUMMARY_TICKERS]
+
+        line = f"{turn.question[:80]}" + (f" [{','.join(turn.tickers)}]" if turn.tickers else "")
+        self.summary_lines.append(line)
+        self.nbytes += sys.getsizeof(line) + 8
+        while len(self.summary_lines) > 1 and _tokens(self.summary()) > self.summary_tokens:
+            dropped = self.summary_lines.popleft()
+            self.nbytes -= sys.getsizeof(dropped) + 8
+
+    def summary(self) -> str:
+        if not self.summary_lines:
+            return ""
+        head = f"Earlier: companies {', '.join(self.summary_tickers)}. " if self.summary_tickers else "Earlier: "
+        return head + " | ".join(self.summary_lines)
+
+    def context(self, max_tokens: int = 300) -> str:
+        """
+        Newest turns first until `max_tokens` is reached, then the summary if it
+        still fits; returned oldest-first for the prompt.
+        """
+        lines, used = [], 0
+        for turn in reversed(self.turns):
+            line = turn.render()
+            cost = _tokens(line)
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        summary = self.summary()
+        if summary and used + _tokens(summary) <= max_tokens:
+            lines.append(summary)
+        return "\n".join(reversed(lines))
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+
+class SessionStore:
+    """
+    Sessions keyed by id, LRU-ordered. Beyond `max_sessions` the least
+    recently used session is evicted, and sessions idle for more than
+    `idle_ttl_s` are dropped by `evict_idle()` (called on every `get`).
+    Pinned sessions (a turn is waiting or running) are skipped, so the
+    store can exceed `max_sessions` by the number of in-flight sessions.
+    Worst-case memory is about (max_sessions + in-flight) x budget_bytes.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        budget_bytes: int = 4096,
+        summary_tokens: int = 200,
+        idle_ttl_s: Optional[float] = 3600.0,
+    ):
+        self.max_sessions = max_sessions
+        self.budget_bytes = budget_bytes
+        self.summary_tokens = summary_tokens
+        self.idle_ttl_s = idle_ttl_s
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        with self._lock:
+            return self._get(session_id)
+
+    def pin(self, session_id: str) -> Session:
+        """`get` for a turn about to run; the session is kept until `unpin`."""
+        with self._lock:
+            return self._get(session_id, pin=True)
+
+    def unpin(self, session: Session):
+        with self._lock:
+            session.pins -= 1
+            session.last_access = now = time.monotonic()
+            self._evict(now)  # catch up on evictions skipped while it was pinned
+
+    def _get(self, session_id: str, pin: bool = False) -> Session:
+        now = time.monotonic()
+        s = self._sessions.get(session_id)
+        if s is None:
+            s = Session(self.budget_bytes, self.summary_tokens)
+            self._sessions[session_id] = s
+        else:
+            self._sessions.move_to_end(session_id)
+        s.last_access = now
+        s.pins += pin
+        self._evict(now, keep=session_id)
+        return s
+
+    def _evict(self, now: float, keep: Optional[str] = None):
+        # LRU order: the oldest access is first, so both scans stop early.
+        excess = len(self._sessions) - self.max_sessions
+        doomed = {}
+        if excess > 0:
+            unpinned = (sid for sid, s in self._sessions.items() if not s.pins and sid != keep)
+            doomed = dict.fromkeys(itertools.islice(unpinned, excess))
+        if self.idle_ttl_s is not None:
+            for sid, s in self._sessions.items():
+                if now - s.last_access <= self.idle_ttl_s:
+                    break
+                if not s.pins and sid != keep:
+                    doomed[sid] = None
+        for sid in doomed:
+            del self._sessions[sid]
+        self.evicted += len(doomed)
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = [s.nbytes for s in self._sessions.values()]
+        return {
+            "sessions": len(sizes),
+            "max_sessions": self.max_sessions,
+            "budget_bytes": self.budget_bytes,
+            "est_bytes_total": sum(sizes),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,267 @@
+# src/sql_validate.py
+from __future__ import annotations
+
+import difflib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from src.db import TABLE_NAME
+from src.schemas import FIN_COLUMNS
+
+SQL_ROW_LIMIT = 200
+MAX_LOCAL_FIXES = 4
+
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+_MISSING_COLUMN_RE = re.compile(r'Referenced column "([^"]+)" not found')
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_YEAR_RE = re.compile(r"(?:19|20)\d\d")
+_SMART_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+
+
+class SQLValidationError(ValueError):
+    """The SQL is invalid and could not be fixed locally (needs an LLM repair)."""
+
+
+def _split_literals(sql: str) -> List[str]:
+    """Split into alternating [code, 'literal', code, ...] segments."""
+    return _LITERAL_RE.split(sql)
+
+
+def strip_literals(sql: str) -> str:
+    return "".join(seg if i % 2 == 0 else "''" for i, seg in enumerate(_split_literals(sql)))
+
+
+def _replace_identifier(sql: str, ident: str, replacement: str) -> str:
+    """Replace a (bare or double-quoted) identifier outside string literals."""
+    pattern = re.compile(rf'"{re.escape(ident)}"|(?<![\w"]){re.escape(ident)}(?![\w"])', re.IGNORECASE)
+    parts = _split_literals(sql)
+    return "".join(pattern.sub(replacement, seg) if i % 2 == 0 else seg for i, seg in enumerate(parts))
+
+
+# ---------- parsing / read-only enforcement ----------
+
+def _serialize(con, sql: str) -> Dict[str, Any]:
+    raw = con.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0]
+    return json.loads(raw)
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for v in node.values():
+            yield from _walk(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk(v)
+
+
+def _check_read_only(ast: Dict[str, Any]) -> List[str]:
+    """
+    Enforce one SELECT statement without table functions.
+    Returns referenced tables other than financial_overview and the query's own CTEs.
+    """
+    statements = ast.get("statements", [])
+    if len(statements) != 1:
+        raise SQLValidationError(f"Expected exactly one SELECT statement, got {len(statements)}.")
+
+    root = statements[0]["node"]
+    ctes = {
+        entry.get("key", "").lower()
+        for node in _walk(root)
+        for entry in (node.get("cte_map") or {}).get("map", [])
+    }
+    unknown = []
+    for node in _walk(root):
+        kind = node.get("type")
+        if kind == "TABLE_FUNCTION":
+            raise SQLValidationError("Table functions are not allowed; query financial_overview only.")
+        if kind == "BASE_TABLE":
+            name = node.get("table_name") or ""
+            if name.lower() != TABLE_NAME.lower() and name.lower() not in ctes:
+                unknown.append(name)
+    return unknown
+
+
+def _has_limit(ast: Dict[str, Any]) -> bool:
+    root = ast["statements"][0]["node"]
+    return any(m.get("type") == "LIMIT_MODIFIER" for m in root.get("modifiers", []))
+
+
+# ---------- local fixes ----------
+
+def strip_comments(sql: str) -> str:
+    """Drop -- and /* */ comments outside string literals."""
+    return "".join(
+        _COMMENT_RE.sub(" ", seg) if i % 2 == 0 else seg for i, seg in enumerate(_split_literals(sql))
+    )
+
+
+def normalize_sql_text(sql: str) -> str:
+    """Smart quotes, markdown fences, comments and trailing semicolons removed."""
+    s = sql.translate(_SMART_QUOTES).strip()
+    s = re.sub(r"^```(?:sql)?\s*|\s*```$", "", s, flags=re.IGNORECASE).strip()
+    s = strip_comments(s).strip()
+    return s.rstrip(";").strip()
+
+
+def _fix_parse_error(sql: str, msg: str) -> str | None:
+    if "unterminated quoted string" in msg and sql.count("'") % 2 == 1:
+        return sql + "'"
+    return None
+
+
+def _match_column(ident: str) -> str | None:
+    """
+    A column that is clearly a misspelling of `ident`: close spelling (0.8,
+    also against the name without its "_billions" unit), the same first
+    letters, and exactly the same year tokens, so "revenue_2024" never
+    becomes 2023 data. Anything less certain goes to the LLM repair.
+    """
+    low = ident.lower()
+    variants = {}
+    for col in FIN_COLUMNS:
+        variants[col] = col
+        if col.endswith("_billions"):
+            variants.setdefault(col[: -len("_billions")], col)
+    for cand in difflib.get_close_matches(low, variants.keys(), n=3, cutoff=0.8):
+        col = variants[cand]
+        if len(os.path.commonprefix([low, col])) < min(3, len(low)):
+            continue
+        if _YEAR_RE.findall(low) != _YEAR_RE.findall(col):
+            continue
+        return col
+    return None
+
+
+def _fix_missing_column(sql: str, ident: str) -> Tuple[str, str] | None:
+    quoted = f'"{ident}"' in sql
+    match = _match_column(ident)
+    if match:
+        return _replace_identifier(sql, ident, match), f"column {ident} -> {match}"
+    if quoted:
+        # "Apple" written with double quotes is an identifier in SQL; the model meant a string.
+        literal = "'" + ident.replace("'", "''") + "'"
+        return sql.replace(f'"{ident}"', literal), f'quoted "{ident}" as a string literal'
+    return None
+
+
+def _fix_missing_table(sql: str, ident: str) -> Tuple[str, str] | None:
+    if difflib.get_close_matches(ident.lower(), [TABLE_NAME], n=1, cutoff=0.5):
+        return _replace_identifier(sql, ident, TABLE_NAME), f"table {ident} -> {TABLE_NAME}"
+    return None
+
+
+def validate_sql(con, sql: str, row_limit: int = SQL_ROW_LIMIT) -> Tuple[str, List[str]]:
+    """
+    Parse and bind `sql` with DuckDB itself and fix common LLM mistakes locally.
+
+    Returns (sql, fixes). Raises SQLValidationError when the SQL is unsafe or
+    still broken after local fixes; the message is meant for repair_sql().
+    """
+    t0 = time.perf_counter()
+    fixes: List[str] = []
+    s = normalize_sql_text(sql)
+    if s != sql.strip().rstrip(";").strip():
+        fixes.append("normalized quotes/fences/comments")
+
+    for _ in range(MAX_LOCAL_FIXES + 1):
+        ast = _serialize(con, s)
+        if ast.get("error"):
+            msg = ast.get("error_message", "parse error")
+            fixed = _fix_parse_error(s, msg)
+            if fixed is None:
+                _record_local(t0, fixes, ok=False)
+                raise SQLValidationError(msg)
+            s = fixed
+            fixes.append("closed unterminated string")
+            continue
+
+        try:
+            unknown = _check_read_only(ast)
+        except SQLValidationError:
+            _record_local(t0, fixes, ok=False)
+            raise
+        if unknown:
+            # Checked before binding: a file path like 'x.csv' would otherwise be read by EXPLAIN.
+            result = _fix_missing_table(s, unknown[0])
+            if result is None or result[0] == s:
+                _record_local(t0, fixes, ok=False)
+                raise SQLValidationError(f"Table with name {unknown[0]} does not exist!")
+            s, note = result
+            fixes.append(note)
+            continue
+
+        try:
+            con.execute(f"EXPLAIN {s}")
+        except Exception as e:
+            msg = str(e)
+            col = _MISSING_COLUMN_RE.search(msg)
+            result = _fix_missing_column(s, col.group(1)) if col else None
+            if result is None or result[0] == s:
+                _record_local(t0, fixes, ok=False)
+                raise SQLValidationError(msg) from e
+            s, note = result
+            fixes.append(note)
+            continue
+
+        if row_limit and not _has_limit(ast):
+            s = f"{s}\nLIMIT {row_limit}"
+        _record_local(t0, fixes, ok=True)
+        return s, fixes
+
+    _record_local(t0, fixes, ok=False)
+    raise SQLValidationError(f"Too many errors after local fixes: {fixes}")
+
+
+# ---------- repair accounting ----------
+
+_stats_lock = threading.Lock()
+_stats = {
+    "validated": 0,
+    "fixed_locally": 0,
+    "sent_to_llm": 0,
+    "local_ms_total": 0.0,
+    "llm_repair_ms_total": 0.0,
+    "llm_repairs_timed": 0,
+}
+
+
+def _record_local(t0: float, fixes: List[str], ok: bool):
+    with _stats_lock:
+        _stats["validated"] += 1
+        _stats["local_ms_total"] += (time.perf_counter() - t0) * 1000
+        if ok and fixes:
+            _stats["fixed_locally"] += 1
+
+
+def record_llm_repair(elapsed_ms: float):
+    with _stats_lock:
+        _stats["sent_to_llm"] += 1
+        _stats["llm_repair_ms_total"] += elapsed_ms
+        _stats["llm_repairs_timed"] += 1
+
+
+def repair_stats() -> Dict[str, Any]:
+    """
+    Share of repairs handled without the LLM, and the latency that saved
+    (local fixes x mean observed LLM repair time, minus local validation time).
+    """
+    with _stats_lock:
+        s = dict(_stats)
+    repairs = s["fixed_locally"] + s["sent_to_llm"]
+    llm_avg = s["llm_repair_ms_total"] / s["llm_repairs_timed"] if s["llm_repairs_timed"] else None
+    local_avg = s["local_ms_total"] / s["validated"] if s["validated"] else 0.0
+    return {
+        "validated": s["validated"],
+        "repairs": repairs,
+        "fixed_locally": s["fixed_locally"],
+        "sent_to_llm": s["sent_to_llm"],
+        "local_share": round(s["fixed_locally"] / repairs, 3) if repairs else None,
+        "local_validate_ms_avg": round(local_avg, 2),
+        "llm_repair_ms_avg": round(llm_avg, 1) if llm_avg is not None else None,
+        "latency_saved_ms_est": round(s["fixed_locally"] * (llm_avg - local_avg), 1) if llm_avg is not None else None,
+    }
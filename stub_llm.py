@@ -0,0 +1,166 @@
+"""
+Local OpenAI-compatible stub for load tests (no Groq quota needed).
+
+Enforces a requests-per-minute limit with 429 + Retry-After like Groq does,
+adds a fixed latency, and returns canned JSON that the router, SQL agent and
+RAG answerer can parse.
+
+    python stub_llm.py --port 8089 --rpm 60 --latency 0.3
+    GROQ_API_KEY=stub GROQ_BASE_URL=http://127.0.0.1:8089/v1 streamlit run app.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_SQL = (
+    "SELECT company_name, ticker, market_cap_billions "
+    "FROM financial_overview ORDER BY market_cap_billions DESC LIMIT 5"
+)
+
+
+def _reply_for(messages) -> str:
+    text = "\n".join(m.get("content") or "" for m in messages)
+
+    if "routing function" in text:
+        q = text.rsplit("Question:", 1)[-1].lower()
+        qualitative = any(w in q for w in ("initiative", "risk", "strategy", "why", "how", "headwind"))
+        return json.dumps({"route": "RAG" if qualitative else "SQL", "reason": "stub route"})
+
+    if "SQL generator" in text or "SQL repair" in text:
+        return json.dumps({"sql": STUB_SQL})
+
+    if "digest map step" in text:
+        topics = re.findall(r"^- (\w+): ", text, flags=re.MULTILINE)
+        return json.dumps({
+            "points": [
+                {"topic": t, "text": f"Stub {t} point.", "cites": [1], "evidence": "stub evidence"}
+                for t in topics
+            ]
+        })
+
+    if "digest reduce step" in text:
+        n = len(re.findall(r"^\[\d+\] ", text, flags=re.MULTILINE))
+        return json.dumps({
+            "bullets": [
+                {"text": "Stub merged point.", "points": list(range(i + 1, n + 1, 3)), "evidence": "stub evidence"}
+                for i in range(min(n, 3))
+            ]
+        })
+
+    if "careful analyst" in text:
+        m = re.search(r"tickers: \[([^\]]*)\]", text)
+        tickers = re.findall(r"'([^']+)'", m.group(1)) if m else []
+        return json.dumps({
+            "sections": [
+                {
+                    "ticker": t,
+                    "source": f"docs/{t}.pdf",
+                    "bullets": [{"text": "Stub insight.", "cites": [1], "evidence": "stub evidence"}],
+                }
+                for t in tickers
+            ]
+        })
+
+    return "LLM_OK"
+
+
+class _State:
+    def __init__(self, rpm: int, latency: float):
+        self.rpm = rpm
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.requests = 0
+        self.rejected = 0
+
+    def admit(self) -> float:
+        """0 if admitted, else seconds until the window frees a slot."""
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            if self.rpm > 0 and len(self.window) >= self.rpm:
+                self.rejected += 1
+                return max(60 - (now - self.window[0]), 0.01)
+            self.window.append(now)
+            return 0.0
+
+
+def _make_handler(state: _State):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, body: dict, headers=None):
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+
+            retry = state.admit()
+            if retry:
+                self._send(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                    {"Retry-After": f"{retry:.2f}"},
+                )
+                return
+
+            time.sleep(state.latency)
+            content = _reply_for(req.get("messages", []))
+            self._send(200, {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": req.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+    return Handler
+
+
+def start_stub_server(port: int = 8089, rpm: int = 60, latency: float = 0.3):
+    """Start the stub in a daemon thread. Returns (server, state)."""
+    state = _State(rpm, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--rpm", type=int, default=60)
+    ap.add_argument("--latency", type=float, default=0.3)
+    args = ap.parse_args()
+
+    server, _ = start_stub_server(args.port, args.rpm, args.latency)
+    print(f"stub LLM on http://127.0.0.1:{args.port}/v1 (rpm={args.rpm}, latency={args.latency}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()